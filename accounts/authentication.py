@@ -0,0 +1,237 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from accounts.models import User
+
+
+def get_user_version_key(user_id: int) -> str:
+    """Returns the cache key of a user's version stamp."""
+    return f'user-version:{user_id}'
+
+
+def get_user_version(user_id: int) -> str:
+    """Returns the version stamp of a user, changed whenever the user is saved.
+
+    The stamps are kept in the default cache, which is shared by all processes, so a save
+    in one process invalidates the user cached by the others. The stamp is random rather
+    than a counter, so a stamp evicted from the cache is never recreated with the value of
+    an older version.
+
+    Args:
+        user_id (int): The id of the user.
+
+    Returns:
+        str: The current version stamp of the user.
+    """
+    key = get_user_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_user_version(user_id: int) -> str:
+    """Async version of get_user_version."""
+    key = get_user_version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, uuid.uuid4().hex, None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_user_version(user_id: int):
+    """Changes the version stamp of a user, invalidating the cached copies of the user.
+
+    Args:
+        user_id (int): The id of the user.
+    """
+    cache.set(get_user_version_key(user_id), uuid.uuid4().hex, None)
+
+
+class UserCache:
+    """Bounded least recently used cache of users, kept per process.
+
+    Entries expire after a timeout and only match the version stamp they were stored with.
+    Copies are stored and returned, so requests never share a user instance.
+    """
+
+    def __init__(self, max_size: int, timeout: float):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.entries: OrderedDict[int, tuple[str, float, User]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id: int, version: str) -> Optional[User]:
+        """Returns a copy of the cached user, None if missing, expired or outdated.
+
+        Args:
+            user_id (int): The id of the user.
+            version (str): The current version stamp of the user.
+
+        Returns:
+            Optional[User]: A copy of the cached user.
+        """
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            entry_version, expires_at, user = entry
+            if entry_version != version or expires_at <= time.monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return copy.copy(user)
+
+    def set(self, user_id: int, version: str, user: User):
+        """Stores a copy of a user, evicting the least recently used user when full.
+
+        Args:
+            user_id (int): The id of the user.
+            version (str): The version stamp read before the user was loaded.
+            user (User): The user to cache.
+        """
+        with self.lock:
+            expires_at = time.monotonic() + self.timeout
+            self.entries[user_id] = (version, expires_at, copy.copy(user))
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """Drops all cached users."""
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache(
+    max_size=settings.AUTH_USER_CACHE_SIZE, timeout=settings.AUTH_USER_CACHE_TIMEOUT
+)
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """JWT authentication that can also look up the user with the async ORM.
+
+    Sync views authenticate as before, async views await aauthenticate instead.
+    """
+
+    async def aauthenticate(self, request: Request) -> Optional[tuple[User, Token]]:
+        """Authenticates the request like authenticate, without blocking the event loop.
+
+        Args:
+            request (Request): The request to authenticate.
+
+        Returns:
+            Optional[tuple[User, Token]]: The user and the validated token, None if the
+                                          request carries no JSON web token.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token: Token) -> User:
+        """Finds the user of a validated token like get_user, with the async ORM.
+
+        Args:
+            validated_token (Token): The validated token.
+
+        Returns:
+            User: The active user identified by the token.
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        try:
+            user = await self.user_model.objects.aget(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        self.check_user(user, validated_token)
+        return user
+
+    def check_user(self, user: User, validated_token: Token):
+        """Checks that the user may authenticate with the token, as done by get_user.
+
+        Args:
+            user (User): The user identified by the token.
+            validated_token (Token): The validated token.
+
+        Raises:
+            AuthenticationFailed: If the user is inactive or the token was revoked.
+        """
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _('The user\'s password has been changed.'),
+                    code='password_changed',
+                )
+
+
+class CachedJWTAuthentication(AsyncJWTAuthentication):
+    """JWT authentication serving the user from the per-process user cache.
+
+    The user is only selected when it is not cached, when its entry expired, or when the
+    user was saved since it was cached, see bump_user_version.
+    """
+
+    def get_user(self, validated_token: Token) -> User:
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        # the version is read first so that a concurrent save is never cached as current
+        version = get_user_version(user_id)
+        user = user_cache.get(user_id, version)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, version, user)
+        else:
+            self.check_user(user, validated_token)
+        return user
+
+    async def aget_user(self, validated_token: Token) -> User:
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return await super().aget_user(validated_token)
+
+        version = await aget_user_version(user_id)
+        user = user_cache.get(user_id, version)
+        if user is None:
+            user = await super().aget_user(validated_token)
+            user_cache.set(user_id, version, user)
+        else:
+            self.check_user(user, validated_token)
+        return user
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
 
+from death_notes.models import FieldTrackingMixin
+
 
 class UserManager(BaseUserManager):
     """Custom user manager to use email instead of username"""
@@ -42,7 +44,7 @@ class UserManager(BaseUserManager):
         return self.create_user(email, password, **extra_fields)
 
 
-class User(AbstractUser):
+class User(FieldTrackingMixin, AbstractUser):
     """
     Custom User model that uses email instead of username for authentication.
 
@@ -73,6 +75,8 @@ class User(AbstractUser):
 
     objects = UserManager()  # custom user manager
 
+    tracked_fields = ('interval',)  # compared by the signal handlers on save
+
     def __str__(self) -> str:
         """String representation of the user object."""
         return self.email
@@ -1,12 +1,21 @@
 from typing import Callable
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.test import RequestFactory, TestCase
 from django.urls import reverse
 from msal import ConfidentialClientApplication
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
+from accounts.authentication import (
+    AsyncJWTAuthentication,
+    CachedJWTAuthentication,
+    UserCache,
+    user_cache,
+)
 from accounts.clients.microsoft import SCOPES, USER_INFO_URL, get_user_info, msal_app
 from accounts.models import User
 
@@ -232,15 +241,133 @@ class ModelTests(TestCase):
 class SignalTests(TestCase):
     """Test the signals in the accounts app."""
 
-    def test_pre_save_user(self):
-        """Test the pre_save_user signal handler."""
+    def test_user_tracks_changes(self):
+        """Test that User tracks changes to its interval."""
         # Given
         user = User.objects.create_user(
             email='user@test.com', password='foobar', interval=7
         )
         # When
         user.interval = 14
+        # Then
+        self.assertTrue(user.has_changed('interval'))
+        self.assertEqual(user.previous('interval'), 7)
+        # When
         user.save()
         # Then
-        self.assertTrue(hasattr(user, '__previous_interval'))
-        self.assertEqual(getattr(user, '__previous_interval'), 7)
+        self.assertFalse(user.has_changed('interval'))
+        self.assertEqual(user.previous('interval'), 14)
+
+    def test_user_save_update_fields_keeps_changes(self):
+        """Test that saving other fields keeps tracking the unsaved interval change."""
+        # Given
+        user = User.objects.create_user(
+            email='user@test.com', password='foobar', interval=7
+        )
+        # When
+        user.interval = 10
+        user.save(update_fields=['last_checkin'])
+        # Then
+        self.assertTrue(user.has_changed('interval'))
+        self.assertEqual(user.previous('interval'), 7)
+        # When
+        user.save(update_fields=['interval'])
+        # Then
+        self.assertFalse(user.has_changed('interval'))
+
+
+class AuthenticationTests(TestCase):
+    """Test the authentication classes in the accounts app."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(email='user@test.com', password='foobar')
+        user_cache.clear()
+
+    def get_request(self, user: User) -> Request:
+        """Builds a request carrying an access token of the user."""
+        token = AccessToken.for_user(user)
+        return Request(self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+
+    async def test_async_jwt_authentication(self):
+        """Test authenticating a request with the async ORM."""
+        # Given
+        request = self.get_request(self.user)
+        # When
+        user, token = await AsyncJWTAuthentication().aauthenticate(request)
+        # Then
+        self.assertEqual(user, self.user)
+        self.assertEqual(token['user_id'], self.user.id)
+
+    async def test_async_jwt_authentication_inactive_user(self):
+        """Test that inactive users are rejected by the async authentication."""
+        # Given
+        self.user.is_active = False
+        await self.user.asave(update_fields=['is_active'])
+        request = self.get_request(self.user)
+        # When / Then
+        with self.assertRaises(AuthenticationFailed):
+            await AsyncJWTAuthentication().aauthenticate(request)
+
+    async def test_async_jwt_authentication_without_token(self):
+        """Test that requests without a token are left unauthenticated."""
+        # Given
+        request = Request(self.factory.get('/'))
+        # When
+        result = await AsyncJWTAuthentication().aauthenticate(request)
+        # Then
+        self.assertIsNone(result)
+
+    def test_cached_jwt_authentication(self):
+        """Test that the user is only selected again after it was saved."""
+        # Given
+        authentication = CachedJWTAuthentication()
+        with self.assertNumQueries(1):
+            first_user, _ = authentication.authenticate(self.get_request(self.user))
+        # When
+        with self.assertNumQueries(0):
+            cached_user, _ = authentication.authenticate(self.get_request(self.user))
+        self.user.interval = 10
+        self.user.save()
+        with self.assertNumQueries(1):
+            saved_user, _ = authentication.authenticate(self.get_request(self.user))
+        # Then
+        self.assertEqual(cached_user, self.user)
+        self.assertIsNot(cached_user, first_user)
+        self.assertEqual(cached_user.interval, 0)
+        self.assertEqual(saved_user.interval, 10)
+
+    async def test_cached_jwt_authentication_async(self):
+        """Test that async authentication shares the cached user."""
+        # Given
+        authentication = CachedJWTAuthentication()
+        await authentication.aauthenticate(self.get_request(self.user))
+        self.user.is_active = False
+        await User.objects.filter(id=self.user.id).aupdate(is_active=False)
+        # When
+        cached_user, _ = await authentication.aauthenticate(self.get_request(self.user))
+        await self.user.asave(update_fields=['is_active'])
+        # Then
+        self.assertTrue(cached_user.is_active)
+        with self.assertRaises(AuthenticationFailed):
+            await authentication.aauthenticate(self.get_request(self.user))
+
+    def test_user_cache(self):
+        """Test that the user cache evicts the least recently used and expired users."""
+        # Given
+        cache = UserCache(max_size=2, timeout=60)
+        users = [User(id=id, email=f'user{id}@test.com') for id in range(1, 4)]
+        # When
+        with patch('accounts.authentication.time.monotonic', return_value=0):
+            cache.set(1, 'v1', users[0])
+            cache.set(2, 'v1', users[1])
+            cache.get(1, 'v1')
+            cache.set(3, 'v1', users[2])
+        # Then
+        with patch('accounts.authentication.time.monotonic', return_value=30):
+            self.assertEqual(cache.get(1, 'v1'), users[0])
+            self.assertIsNone(cache.get(2, 'v1'))
+            self.assertIsNone(cache.get(3, 'v2'))
+        with patch('accounts.authentication.time.monotonic', return_value=60):
+            self.assertIsNone(cache.get(1, 'v1'))
@@ -0,0 +1,28 @@
+from web.constants import MESSAGE_TYPE_MAPPING
+from web.models import ActivityLog, Message
+
+
+# verbs describing the message activities in the activity log
+MESSAGE_ACTIVITY_VERBS = {
+    ActivityLog.Type.MESSAGE_CREATED: 'scheduled',
+    ActivityLog.Type.MESSAGE_DELIVERED: 'delivered',
+    ActivityLog.Type.MESSAGE_DELETED: 'deleted',
+}
+
+
+def build_message_activity_log(message: Message, type: str) -> ActivityLog:
+    """Builds an unsaved ActivityLog instance for an activity on a message.
+
+    Args:
+        message (Message): The message the activity was performed on.
+        type (str): The type of the activity, one of the message activity types.
+
+    Returns:
+        ActivityLog: The unsaved activity log.
+    """
+    verb = MESSAGE_ACTIVITY_VERBS[type]
+    return ActivityLog(
+        user_id=message.user_id,
+        type=type,
+        description=f'{MESSAGE_TYPE_MAPPING[message.type]} - "{message.subject}" {verb}.',
+    )
@@ -11,6 +11,7 @@ class JobAdmin(admin.ModelAdmin):
         'message',
         'scheduled_at',
         'is_completed',
+        'attempts',
     )
     list_select_related = ('message',)
     autocomplete_fields = ('message',)
@@ -0,0 +1,201 @@
+import socketserver
+import statistics
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from typing import Iterator
+from unittest.mock import patch
+
+from django.core import mail
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import User
+from cron.models import Job
+from cron.tasks import process_pending_jobs
+from web.models import Message, MessageRecipient
+
+
+# email backends the delivery path can be benchmarked against
+BACKENDS = ('locmem', 'smtp')
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP session that accepts and discards every message."""
+
+    def reply(self, code: int, text: str):
+        self.wfile.write(f'{code} {text}\r\n'.encode())
+
+    def handle(self):
+        self.reply(220, 'localhost ESMTP sink')
+        while line := self.rfile.readline():
+            command = line[:4].upper()
+            if command in (b'HELO', b'EHLO'):
+                self.reply(250, 'localhost')
+            elif command == b'DATA':
+                self.reply(354, 'End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.count()
+                self.reply(250, 'OK')
+            elif command == b'QUIT':
+                self.reply(221, 'Bye')
+                return
+            else:
+                # accept MAIL, RCPT, RSET and NOOP
+                self.reply(250, 'OK')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Local SMTP server on a free port counting the messages it receives."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPSinkHandler)
+        self.received = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def count(self):
+        with self.lock:
+            self.received += 1
+
+    @classmethod
+    @contextmanager
+    def serve(cls) -> Iterator['SMTPSink']:
+        """Runs the sink in a background thread for the duration of the context."""
+        with cls() as sink:
+            thread = threading.Thread(target=sink.serve_forever, daemon=True)
+            thread.start()
+            try:
+                yield sink
+            finally:
+                sink.shutdown()
+                thread.join()
+
+
+def seed(messages: int, users: int, recipients: int) -> list[int]:
+    """Creates users with time capsule messages whose jobs are due.
+
+    Rows are bulk created, bypassing the signals, so that seeding is fast.
+
+    Args:
+        messages (int): The number of messages to create.
+        users (int): The number of users to spread the messages over.
+        recipients (int): The number of recipients per message.
+
+    Returns:
+        list[int]: The ids of the created messages.
+    """
+    prefix = uuid.uuid4().hex[:8]
+    owners = User.objects.bulk_create(
+        User(email=f'bench-{prefix}-{i}@bench.test', first_name='Bench')
+        for i in range(users)
+    )
+    due = timezone.now() - timedelta(minutes=1)
+    created = Message.objects.bulk_create(
+        Message(
+            user=owners[i % users],
+            type=Message.Type.TIME_CAPSULE,
+            recipients=', '.join(
+                f'recipient-{i}-{j}@bench.test' for j in range(recipients)
+            ),
+            subject=f'Benchmark message {i}',
+            text='Benchmark text',
+            scheduled_at=due,
+        )
+        for i in range(messages)
+    )
+    MessageRecipient.objects.bulk_create(
+        MessageRecipient(message=message, address=address.strip())
+        for message in created
+        for address in message.recipients.split(',')
+    )
+    Job.objects.bulk_create(
+        Job(message=message, scheduled_at=due) for message in created
+    )
+    return [message.id for message in created]
+
+
+def percentile(values: list[float], percent: int) -> float:
+    """Returns the percentile of the values, or 0 if there are none."""
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+def run_benchmark(
+    backend: str, messages: int, users: int, recipients: int, workers: int
+) -> dict:
+    """Seeds due jobs and measures a single run of process_pending_jobs.
+
+    Args:
+        backend (str): The email backend to deliver to, one of BACKENDS.
+        messages (int): The number of messages to deliver.
+        users (int): The number of users to spread the messages over.
+        recipients (int): The number of recipients per message.
+        workers (int): The number of delivery workers.
+
+    Returns:
+        dict: The throughput, per job latencies and query counts of the run.
+    """
+    message_ids = seed(messages=messages, users=users, recipients=recipients)
+    latencies = []
+    send = Message.send
+
+    def timed_send(message: Message, *args, **kwargs) -> bool:
+        # measure the render and send time of every job in its worker
+        start = time.perf_counter()
+        try:
+            return send(message, *args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    with ExitStack() as stack:
+        overrides = {
+            'EMAIL_BACKEND': 'django.core.mail.backends.locmem.EmailBackend',
+            'DELIVERY_WORKERS': workers,
+        }
+        if backend == 'smtp':
+            sink = stack.enter_context(SMTPSink.serve())
+            overrides.update(
+                EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                EMAIL_HOST='127.0.0.1',
+                EMAIL_PORT=sink.port,
+                EMAIL_USE_TLS=False,
+                EMAIL_HOST_USER='',
+                EMAIL_HOST_PASSWORD='',
+            )
+        stack.enter_context(override_settings(**overrides))
+        stack.enter_context(patch.object(Message, 'send', timed_send))
+        queries = stack.enter_context(CaptureQueriesContext(connection))
+        start = time.perf_counter()
+        process_pending_jobs()
+        elapsed = time.perf_counter() - start
+    mail.outbox = []
+
+    delivered = Job.objects.filter(
+        message_id__in=message_ids, is_completed=True
+    ).count()
+    return {
+        'backend': backend,
+        'messages': messages,
+        'recipients_per_message': recipients,
+        'workers': workers,
+        'delivered': delivered,
+        'seconds': round(elapsed, 4),
+        'messages_per_second': round(delivered / elapsed, 2) if elapsed else 0.0,
+        'latency_p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'latency_p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'queries': len(queries),
+        'queries_per_job': round(len(queries) / messages, 3) if messages else 0.0,
+    }
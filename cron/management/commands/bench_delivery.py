@@ -0,0 +1,55 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from cron.benchmark import BACKENDS, run_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the delivery of pending jobs and prints the results as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--messages', type=int, default=200, help='Number of due messages.'
+        )
+        parser.add_argument(
+            '--users', type=int, default=10, help='Number of users owning them.'
+        )
+        parser.add_argument(
+            '--recipients', type=int, default=1, help='Recipients per message.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.DELIVERY_WORKERS,
+            help='Number of delivery workers.',
+        )
+        parser.add_argument(
+            '--backend',
+            choices=BACKENDS,
+            action='append',
+            help='Email backend to deliver to, can be repeated. Defaults to all.',
+        )
+
+    def handle(self, *args, **options):
+        # seed and deliver in a throwaway test database
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            results = [
+                run_benchmark(
+                    backend=backend,
+                    messages=options['messages'],
+                    users=options['users'],
+                    recipients=options['recipients'],
+                    workers=options['workers'],
+                )
+                for backend in options['backend'] or BACKENDS
+            ]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.stdout.write(json.dumps({'results': results}, indent=2))
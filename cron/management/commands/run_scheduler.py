@@ -0,0 +1,44 @@
+import signal
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cron.scheduler import Scheduler
+
+
+class Command(BaseCommand):
+    help = 'Starts a scheduler that delivers messages as soon as their jobs are due.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizon',
+            type=int,
+            default=settings.SCHEDULER_HORIZON_SECONDS,
+            help='Seconds ahead to load upcoming deadlines for.',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.SCHEDULER_POLL_SECONDS,
+            help='Seconds between checks for wake-ups while sleeping.',
+        )
+        parser.add_argument(
+            '--backoff',
+            type=float,
+            default=settings.SCHEDULER_BACKOFF_SECONDS,
+            help='Seconds to wait before retrying after a failed iteration.',
+        )
+
+    def handle(self, *args, **options):
+        scheduler = Scheduler(
+            horizon=timedelta(seconds=options['horizon']),
+            poll_interval=options['poll_interval'],
+            backoff=options['backoff'],
+        )
+        # stop gracefully after the current iteration
+        signal.signal(signal.SIGTERM, lambda *_: scheduler.stop())
+        signal.signal(signal.SIGINT, lambda *_: scheduler.stop())
+        self.stdout.write('Scheduler started')
+        scheduler.run()
+        self.stdout.write('Scheduler stopped')
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.8 on 2026-10-16 23:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cron', '0003_add_scheduled_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='lease_owner',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+    ]
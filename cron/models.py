@@ -1,9 +1,142 @@
+import random
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models import (
+    Case,
+    DateTimeField,
+    DurationField,
+    Expression,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.utils import timezone
 
+from death_notes.models import FieldTrackingMixin
 from web.models import Message
 
 
-class Job(models.Model):
+def as_days(expression: Expression) -> ExpressionWrapper:
+    """Converts an integer expression counting days to a duration expression."""
+    # SQLite only multiplies durations by plain integer fields
+    days = ExpressionWrapper(expression, output_field=IntegerField())
+    return ExpressionWrapper(
+        days * Value(timedelta(days=1)), output_field=DurationField()
+    )
+
+
+class JobQuerySet(models.QuerySet):
+    """Custom queryset for selecting and claiming due jobs."""
+
+    def with_due_at(self) -> 'JobQuerySet':
+        """Annotates the time each job is due at as due_at.
+
+        Time capsules are due at their scheduled time. Final words are due once the user
+        has not checked in for their interval plus the message delay. This is computed at
+        query time, so check-ins and interval changes never write to the jobs.
+        """
+        final_word_delay = as_days(F('message__user__interval') + F('message__delay'))
+        return self.annotate(
+            due_at=Case(
+                When(
+                    message__type=Message.Type.FINAL_WORD,
+                    then=F('message__user__last_checkin') + final_word_delay,
+                ),
+                default=F('scheduled_at'),
+                output_field=DateTimeField(),
+            )
+        )
+
+    def reschedule_final_words(self) -> int:
+        """Resets the scheduled time of FINAL_WORD jobs in this queryset in a single UPDATE.
+
+        The scheduled time is set to the lower bound of the due time, the user's last check-in
+        plus the message delay, computed by the database without loading any instances.
+
+        Returns:
+            int: The number of rescheduled jobs.
+        """
+        lower_bound = Message.objects.filter(pk=OuterRef('message_id')).annotate(
+            lower_bound=ExpressionWrapper(
+                F('user__last_checkin') + as_days(F('delay')),
+                output_field=DateTimeField(),
+            )
+        )
+        return self.filter(message__type=Message.Type.FINAL_WORD).update(
+            scheduled_at=Subquery(lower_bound.values('lower_bound'))
+        )
+
+    def advance_final_words(self) -> int:
+        """Moves the scheduled time of FINAL_WORD jobs that are not due yet forward.
+
+        Check-ins never write to the jobs, so the scheduled time of a job whose user keeps
+        checking in falls behind and the index on it stops narrowing down the pending jobs.
+        The jobs whose scheduled time has passed but which are not due are rescheduled to
+        the current lower bound of their due time, in a single UPDATE.
+
+        Returns:
+            int: The number of rescheduled jobs.
+        """
+        now = timezone.now()
+        return (
+            self.with_due_at()
+            .filter(scheduled_at__lte=now, due_at__gt=now, is_completed=False)
+            .reschedule_final_words()
+        )
+
+    def pending(self) -> 'JobQuerySet':
+        """Filters non-complete jobs of scheduled messages that are due or due for a retry."""
+        now = timezone.now()
+        return self.with_due_at().filter(
+            Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now),
+            message__status=Message.Status.SCHEDULED,
+            # the indexed lower bound narrows down the rows the due time is computed for
+            scheduled_at__lte=now,
+            due_at__lte=now,
+            is_completed=False,
+        )
+
+    def unleased(self) -> 'JobQuerySet':
+        """Filters jobs that are not leased or whose lease has expired."""
+        return self.filter(
+            Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=timezone.now())
+        )
+
+    def claim(self, owner: str, limit: int, duration: timedelta) -> 'JobQuerySet':
+        """Atomically leases up to limit jobs of this queryset to the owner.
+
+        The jobs are selected and leased by a single conditional UPDATE, so concurrent
+        workers never claim the same job and a worker only gets nothing once no unleased
+        job is left. Leases of crashed workers expire after the duration and the jobs
+        become claimable again.
+
+        Args:
+            owner (str): A unique identifier of the claiming worker.
+            limit (int): The maximum number of jobs to claim.
+            duration (timedelta): How long the lease is held before it expires.
+
+        Returns:
+            JobQuerySet: The jobs successfully claimed by the owner.
+        """
+        expires_at = timezone.now() + duration
+        claimed = (
+            Job.objects.filter(id__in=Subquery(self.unleased().values('id')[:limit]))
+            .unleased()
+            .update(lease_owner=owner, lease_expires_at=expires_at)
+        )
+        if not claimed:
+            return self.none()
+        return self.filter(lease_owner=owner, lease_expires_at=expires_at)
+
+
+class Job(FieldTrackingMixin, models.Model):
     """
     Represents a scheduled job in the system.
 
@@ -11,8 +144,14 @@ class Job(models.Model):
         id (AutoField): The primary key for the job.
         message (OneToOneField): A one-to-one relationship to the Message model.
                                  Deletes the job if the related message is deleted.
-        scheduled_at (DateTimeField): The date and time when the job is scheduled to run.
+        scheduled_at (DateTimeField): The date and time when the job is scheduled to run. For
+                                      FINAL_WORD messages, the earliest time the job can be
+                                      due at, see JobQuerySet.with_due_at.
         is_completed (BooleanField): Indicates whether the job has been completed. Defaults to False.
+        lease_owner (CharField): Identifier of the worker currently processing the job, if any.
+        lease_expires_at (DateTimeField): When the lease expires and the job can be claimed again.
+        attempts (PositiveSmallIntegerField): The number of failed delivery attempts.
+        next_attempt_at (DateTimeField): When the delivery is retried after a failed attempt.
         created_at (DateTimeField): The date and time when the job was created. Automatically set on creation.
         updated_at (DateTimeField): The date and time when the job was last updated. Automatically set on update.
     """
@@ -21,10 +160,18 @@ class Job(models.Model):
     message = models.OneToOneField(Message, on_delete=models.CASCADE)
     scheduled_at = models.DateTimeField()
     is_completed = models.BooleanField(default=False)
+    lease_owner = models.CharField(max_length=100, null=True, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = JobQuerySet.as_manager()  # custom manager to claim due jobs
+
+    tracked_fields = ('is_completed',)  # compared by the signal handlers on save
+
     class Meta:
         # order by scheduled_at field
         ordering = ('scheduled_at',)
@@ -32,3 +179,27 @@ class Job(models.Model):
         indexes = [
             models.Index(fields=['scheduled_at']),
         ]
+
+    def schedule_retry(self) -> bool:
+        """Records a failed delivery attempt and schedules a retry with exponential backoff.
+
+        The message is marked as failed once the maximum number of attempts is reached.
+
+        Returns:
+            bool: True if a retry was scheduled, otherwise False.
+        """
+        self.attempts += 1
+        self.lease_owner = self.lease_expires_at = None
+        if self.attempts >= settings.DELIVERY_MAX_ATTEMPTS:
+            self.message.status = Message.Status.FAILED
+            self.next_attempt_at = None
+            return False
+        delay = min(
+            settings.DELIVERY_RETRY_BASE_SECONDS * 2 ** (self.attempts - 1),
+            settings.DELIVERY_RETRY_MAX_SECONDS,
+        )
+        # jitter the delay to spread out retries of jobs that failed together
+        delay = random.uniform(delay / 2, delay)
+        self.message.status = Message.Status.SCHEDULED
+        self.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        return True
@@ -0,0 +1,145 @@
+import heapq
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from cron.models import Job
+from cron.tasks import process_pending_jobs
+from web.models import Message
+
+
+logger = logging.getLogger('django_q')
+
+# event to wake a scheduler running in the same process
+wake_event = threading.Event()
+
+
+def wake_scheduler():
+    """Wakes the scheduler so that it reloads the upcoming deadlines.
+
+    A scheduler in the same process is woken directly, one in another process is woken by
+    touching the wake file it watches. The file is only touched if a scheduler created it.
+    """
+    wake_event.set()
+    try:
+        os.utime(settings.SCHEDULER_WAKE_FILE)
+    except FileNotFoundError:
+        # no scheduler is running
+        pass
+
+
+class Scheduler:
+    """Deadline driven scheduler that sleeps until the next job is due.
+
+    Upcoming deadlines within the horizon are kept in a min-heap. The scheduler sleeps until
+    the earliest deadline, processes the pending jobs and reloads the heap. It is woken
+    early to reload the heap when jobs are created or rescheduled. A failed iteration is
+    logged and retried after a back-off, so a transient database error never stops it.
+    """
+
+    def __init__(self, horizon: timedelta, poll_interval: float, backoff: float):
+        self.horizon = horizon
+        self.poll_interval = poll_interval
+        self.backoff = backoff
+        self.wake_file = Path(settings.SCHEDULER_WAKE_FILE)
+        self.wake_mtime = None
+        self.heap = []
+        self.stopped = threading.Event()
+
+    def load(self):
+        """Loads the deadlines of non-complete jobs due within the horizon into the heap."""
+        horizon = timezone.now() + self.horizon
+        jobs = (
+            Job.objects.with_due_at()
+            .filter(
+                message__status=Message.Status.SCHEDULED,
+                scheduled_at__lte=horizon,
+                due_at__lte=horizon,
+                is_completed=False,
+            )
+            .values_list('id', 'due_at', 'lease_expires_at', 'next_attempt_at')
+        )
+        self.heap = [
+            # a job cannot be claimed before its lease expires or its retry is due
+            (
+                max(filter(None, (due_at, lease_expires_at, next_attempt_at))),
+                job_id,
+            )
+            for job_id, due_at, lease_expires_at, next_attempt_at in jobs
+        ]
+        heapq.heapify(self.heap)
+        logger.debug(f'Scheduler loaded {len(self.heap)} deadlines')
+
+    def next_deadline(self) -> datetime:
+        """Returns the earliest deadline, or the end of the horizon if there is none."""
+        if self.heap:
+            return self.heap[0][0]
+        return timezone.now() + self.horizon
+
+    def is_woken(self) -> bool:
+        """Checks whether the scheduler was woken in process or through the wake file."""
+        if wake_event.is_set():
+            wake_event.clear()
+            return True
+        try:
+            mtime = self.wake_file.stat().st_mtime
+        except FileNotFoundError:
+            self.wake_file.touch()
+            mtime = self.wake_file.stat().st_mtime
+        woken = self.wake_mtime is not None and mtime != self.wake_mtime
+        self.wake_mtime = mtime
+        return woken
+
+    def sleep(self, until: datetime) -> bool:
+        """Sleeps until the given time unless woken or stopped earlier.
+
+        Args:
+            until (datetime): The time to sleep until.
+
+        Returns:
+            bool: True if the scheduler was woken before the given time, otherwise False.
+        """
+        deadline = time.monotonic() + (until - timezone.now()).total_seconds()
+        while (remaining := deadline - time.monotonic()) > 0:
+            if self.stopped.wait(min(remaining, self.poll_interval)):
+                return False
+            if self.is_woken():
+                return True
+        return False
+
+    def tick(self):
+        """Processes the pending jobs if the earliest deadline has passed, then sleeps."""
+        if self.heap and self.heap[0][0] <= timezone.now():
+            process_pending_jobs()
+            self.load()
+            return
+        if self.sleep(self.next_deadline()) or not self.heap:
+            self.load()
+
+    def run(self):
+        """Runs the scheduler until stopped, backing off and reloading after a failure."""
+        self.is_woken()  # create the wake file and record its initial state
+        loaded = False
+        while not self.stopped.is_set():
+            try:
+                if not loaded:
+                    self.load()
+                    loaded = True
+                self.tick()
+            except Exception:
+                # e.g. an OperationalError while the database is locked
+                logger.exception('Scheduler iteration failed')
+                close_old_connections()
+                loaded = False
+                self.stopped.wait(self.backoff)
+
+    def stop(self):
+        """Stops the scheduler after the current iteration."""
+        self.stopped.set()
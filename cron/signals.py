@@ -1,73 +1,48 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
 
-from django.db.models.signals import post_delete, post_save, pre_save
+from django.db import transaction
+from django.db.models import Case, DateTimeField, QuerySet, Value, When
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from django.utils import timezone
 
 from accounts.models import User
+from cron.activity import build_message_activity_log
 from cron.models import Job
-from web.constants import MESSAGE_TYPE_MAPPING
+from cron.scheduler import wake_scheduler
 from web.models import ActivityLog, Message
+from web.signals import post_bulk_save
 
 
-@receiver(post_save, sender=ActivityLog)
-def update_jobs_on_checkin(sender, created: bool, instance: ActivityLog, **kwargs):
-    """Signal handler to update the scheduled time of jobs when an ActivityLog instance is checked in.
+def get_final_word_scheduled_at(message: Message) -> datetime:
+    """Returns the earliest time a FINAL_WORD message can be due at.
 
-    Args:
-        sender (Type[Model]): The model class that sent the signal.
-        created (bool): A boolean indicating whether the instance was created.
-        instance (ActivityLog): The instance of ActivityLog that triggered the signal.
-    """
-    if not created or instance.type != ActivityLog.Type.CHECKED_IN:
-        return
+    Check-ins only move the last check-in forward and the interval is never negative, so
+    the due time computed by JobQuerySet.with_due_at is never earlier than this. Existing
+    jobs are rescheduled to the same time by JobQuerySet.reschedule_final_words.
 
-    # filter user's final word messages with delay
-    jobs = (
-        Job.objects.only('scheduled_at', 'message__delay')
-        .select_related('message')
-        .filter(
-            message__type=Message.Type.FINAL_WORD,
-            message__delay__isnull=False,
-            message__user_id=instance.user_id,
-        )
-    )
-
-    now = timezone.now()
-    for job in jobs:
-        job.scheduled_at = now + timedelta(days=job.message.delay)
+    Args:
+        message (Message): The FINAL_WORD message.
 
-    # bulk update the scheduled time of jobs without triggering signals
-    Job.objects.bulk_update(jobs, ['scheduled_at'])
+    Returns:
+        datetime: The lower bound of the due time stored as the job's scheduled time.
+    """
+    return message.user.last_checkin + timedelta(days=message.delay)
 
 
 @receiver(post_save, sender=User)
-def update_jobs_on_interval_change(sender, created: bool, instance: User, **kwargs):
-    """Signal handler to update the scheduled time of jobs when a User instance's interval is changed.
+def wake_scheduler_on_interval_change(sender, created: bool, instance: User, **kwargs):
+    """Signal handler to wake the scheduler when a User instance's interval is changed.
+
+    FINAL_WORD deadlines are computed from the interval, so a shorter interval can bring
+    them forward.
 
     Args:
         sender (Type[Model]): The model class that sent the signal.
+        created (bool): A boolean indicating whether the instance was created.
         instance (User): The instance of User that triggered the signal.
     """
-    if created or getattr(instance, '__previous_interval', None) == instance.interval:
-        return
-
-    # filter user's time capsule messages
-    jobs = (
-        Job.objects.only('scheduled_at', 'message__delay')
-        .select_related('message')
-        .filter(
-            message__type=Message.Type.FINAL_WORD,
-            message__user_id=instance.id,
-        )
-    )
-
-    delta = instance.interval - instance.__previous_interval
-    for job in jobs:
-        job.scheduled_at += timedelta(days=delta)
-
-    # bulk update the scheduled time of jobs without triggering signals
-    Job.objects.bulk_update(jobs, ['scheduled_at'])
+    if not created and instance.has_changed('interval'):
+        transaction.on_commit(wake_scheduler)
 
 
 @receiver(post_save, sender=Message)
@@ -84,49 +59,83 @@ def post_save_message(sender, created: bool, instance: Message, **kwargs):
         scheduled_at = (
             instance.scheduled_at
             if instance.type == Message.Type.TIME_CAPSULE
-            else timezone.now()
-            + timedelta(days=instance.delay)
-            + timedelta(days=instance.user.interval)
+            else get_final_word_scheduled_at(instance)
         )
         Job.objects.create(
             message=instance,
             scheduled_at=scheduled_at,
         )
+        transaction.on_commit(wake_scheduler)
     else:
         # update the corresponding job if the message is updated
         if instance.type == Message.Type.TIME_CAPSULE:
-            if instance.scheduled_at != getattr(
-                instance, '__previous_scheduled_at', None
-            ):
+            if instance.has_changed('scheduled_at'):
                 Job.objects.filter(message_id=instance.id).update(
                     scheduled_at=instance.scheduled_at
                 )
+                transaction.on_commit(wake_scheduler)
         elif instance.type == Message.Type.FINAL_WORD:
-            if instance.delay != getattr(instance, '__previous_delay', None):
-                scheduled_at = (
-                    timezone.now()
-                    + timedelta(days=instance.delay)
-                    + timedelta(days=instance.user.interval)
-                )
-                Job.objects.filter(message_id=instance.id).update(
-                    scheduled_at=scheduled_at
-                )
+            if instance.has_changed('delay'):
+                Job.objects.filter(message_id=instance.id).reschedule_final_words()
+                transaction.on_commit(wake_scheduler)
 
 
-@receiver(pre_save, sender=Job)
-def pre_save_job(sender, instance: Job, **kwargs):
-    """Signal handler to store the previous value of the is_completed field of a Job instance.
+@receiver(post_bulk_save, sender=Message)
+def post_bulk_save_messages(sender, created: bool, instances: list[Message], **kwargs):
+    """Signal handler to create or reschedule the Job instances of bulk saved Message instances.
+
+    Same as post_save_message and the created branch of post_save_job, with a constant
+    number of queries for all the messages.
 
     Args:
         sender (Type[Model]): The model class that sent the signal.
-        instance (Job): The instance of Job that triggered the signal.
+        created (bool): A boolean indicating whether the instances were created.
+        instances (list[Message]): The bulk saved instances of Message.
     """
-    if instance._state.adding:
-        # skip if the instance is being created
+    if created:
+        Job.objects.bulk_create(
+            Job(
+                message=message,
+                scheduled_at=(
+                    message.scheduled_at
+                    if message.type == Message.Type.TIME_CAPSULE
+                    else get_final_word_scheduled_at(message)
+                ),
+            )
+            for message in instances
+        )
+        ActivityLog.objects.bulk_create(
+            build_message_activity_log(message, ActivityLog.Type.MESSAGE_CREATED)
+            for message in instances
+        )
+        transaction.on_commit(wake_scheduler)
         return
-    # cache the previous value of the is_completed field in the instance for comparison
-    previous = Job.objects.only('is_completed').get(pk=instance.pk)
-    instance.__previous_is_completed = previous.is_completed
+
+    time_capsules = {
+        message.id: message.scheduled_at
+        for message in instances
+        if message.type == Message.Type.TIME_CAPSULE
+        and message.has_changed('scheduled_at')
+    }
+    final_words = [
+        message.id
+        for message in instances
+        if message.type == Message.Type.FINAL_WORD and message.has_changed('delay')
+    ]
+    if time_capsules:
+        Job.objects.filter(message_id__in=time_capsules).update(
+            scheduled_at=Case(
+                *(
+                    When(message_id=message_id, then=Value(scheduled_at))
+                    for message_id, scheduled_at in time_capsules.items()
+                ),
+                output_field=DateTimeField(),
+            )
+        )
+    if final_words:
+        Job.objects.filter(message_id__in=final_words).reschedule_final_words()
+    if time_capsules or final_words:
+        transaction.on_commit(wake_scheduler)
 
 
 @receiver(post_save, sender=Job)
@@ -140,40 +149,63 @@ def post_save_job(sender, created: bool, instance: Job, **kwargs):
     """
     if created:
         # create an activity log for a new job i.e. a new message
-        ActivityLog.objects.create(
-            user_id=instance.message.user_id,
-            type=ActivityLog.Type.MESSAGE_CREATED,
-            description=f'{MESSAGE_TYPE_MAPPING[instance.message.type]} - "{instance.message.subject}" scheduled.',
+        ActivityLog.objects.record(
+            build_message_activity_log(
+                instance.message, ActivityLog.Type.MESSAGE_CREATED
+            )
         )
     if instance.is_completed is False:
         # early return if the job is not completed
         return
-    if (
-        not hasattr(instance, '__previous_is_completed')
-        or instance.is_completed == instance.__previous_is_completed
-    ):
+    if created or not instance.has_changed('is_completed'):
         # early return if the job is not updated
         return
 
     # create an activity log for a completed job
-    ActivityLog.objects.create(
-        user_id=instance.message.user_id,
-        type=ActivityLog.Type.MESSAGE_DELIVERED,
-        description=f'{MESSAGE_TYPE_MAPPING[instance.message.type]} - "{instance.message.subject}" delivered.',
+    ActivityLog.objects.record(
+        build_message_activity_log(instance.message, ActivityLog.Type.MESSAGE_DELIVERED)
     )
 
 
+def get_origin_model(origin) -> type:
+    """Returns the model whose instance or queryset a deletion was started from."""
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
 @receiver(post_delete, sender=Job)
-def post_delete_job(sender, instance: Job, **kwargs):
+def post_delete_job(sender, instance: Job, origin=None, **kwargs):
     """Signal handler to create an ActivityLog instance when a Job instance is deleted.
 
+    Jobs deleted along with their message are logged by post_delete_message instead.
+
     Args:
         sender (Type[Model]): The model class that sent the signal.
         instance (Job): The instance of Job that triggered the signal.
+        origin (Model | QuerySet, optional): The instance or queryset deleted.
     """
-    # create an activity log for a deleted job i.e. a deleted message
-    ActivityLog.objects.create(
-        user_id=instance.message.user_id,
-        type=ActivityLog.Type.MESSAGE_DELETED,
-        description=f'{MESSAGE_TYPE_MAPPING[instance.message.type]} - "{instance.message.subject}" deleted.',
+    if get_origin_model(origin) is not Job:
+        return
+    ActivityLog.objects.record(
+        build_message_activity_log(instance.message, ActivityLog.Type.MESSAGE_DELETED)
+    )
+
+
+@receiver(post_delete, sender=Message)
+def post_delete_message(sender, instance: Message, origin=None, **kwargs):
+    """Signal handler to create an ActivityLog instance when a Message instance is deleted.
+
+    The log is built from the deleted message itself, so deleting many messages does not
+    select each message again through its job.
+
+    Args:
+        sender (Type[Model]): The model class that sent the signal.
+        instance (Message): The instance of Message that triggered the signal.
+        origin (Model | QuerySet, optional): The instance or queryset deleted.
+    """
+    if get_origin_model(origin) is User:
+        # the activity logs of a deleted user are deleted with it
+        return
+    # collected in bulk when many messages are deleted at once
+    ActivityLog.objects.record(
+        build_message_activity_log(instance, ActivityLog.Type.MESSAGE_DELETED)
     )
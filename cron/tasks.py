@@ -1,35 +1,296 @@
 import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from smtplib import SMTPConnectError, SMTPException, SMTPServerDisconnected
 
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
 from django.utils import timezone
 
+from cron.activity import build_message_activity_log
 from cron.models import Job
-from web.models import Message
+from web.models import ActivityLog, Message, MessageRecipient
+from web.stats import invalidate_message_stats
 
 
 logger = logging.getLogger('django_q')
 
+# number of jobs fetched and dispatched to the workers at a time
+CHUNK_SIZE = 10
 
-def process_pending_jobs():
-    """Send messages for all non-complete pending jobs."""
-    # fetch jobs and join relevant table data in chunks for performance
-    pending_jobs = (
-        Job.objects.select_related('message', 'message__user')
-        .filter(
-            message__status=Message.Status.SCHEDULED,
-            scheduled_at__lte=timezone.now(),
-            is_completed=False,
+# job fields updated with the outcome of a delivery
+JOB_OUTCOME_FIELDS = [
+    'is_completed',
+    'lease_owner',
+    'lease_expires_at',
+    'attempts',
+    'next_attempt_at',
+    'updated_at',
+]
+
+
+def send_message(
+    message: Message, connection: BaseEmailBackend, commit: bool = True
+) -> bool:
+    """Sends a message over a kept-alive connection, reconnecting once if it dropped.
+
+    Args:
+        message (Message): The message to send.
+        connection (BaseEmailBackend): The email connection shared across the run.
+        commit (bool, optional): Saves the updated message status. Defaults to True.
+
+    Returns:
+        bool: True if the message was sent successfully, otherwise False.
+    """
+    # open the connection if not already open, this is a no-op otherwise
+    connection.open()
+    batch_size = settings.DELIVERY_BATCH_SIZE
+    try:
+        return message.send(connection=connection, commit=commit, batch_size=batch_size)
+    except SMTPServerDisconnected:
+        logger.warning('SMTP connection dropped, reconnecting')
+        connection.close()
+        connection.open()
+        return message.send(connection=connection, commit=commit, batch_size=batch_size)
+
+
+def is_connection_error(error: Exception) -> bool:
+    """Checks whether an error indicates that the email server cannot be reached.
+
+    Args:
+        error (Exception): The error raised while sending a message.
+
+    Returns:
+        bool: True if the error is a connection error, otherwise False.
+    """
+    if isinstance(error, (SMTPConnectError, SMTPServerDisconnected)):
+        return True
+    # SMTP errors are OS errors too, but other SMTP errors mean the server was reached
+    return isinstance(error, OSError) and not isinstance(error, SMTPException)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of delivering a message while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after consecutive connection failures to stop a run from waiting out timeouts."""
+
+    def __init__(self, threshold: int):
+        self.threshold = threshold
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def record(self, error: Exception = None):
+        """Records the outcome of a delivery, resetting the failures on success.
+
+        Args:
+            error (Exception, optional): The error raised by the delivery, if any.
+        """
+        with self.lock:
+            if error is None:
+                self.failures = 0
+            elif is_connection_error(error):
+                self.failures += 1
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the number of consecutive connection failures reached the threshold."""
+        return self.failures >= self.threshold
+
+
+class DeliveryPool:
+    """Thread pool delivering messages where each worker owns its email connection."""
+
+    def __init__(self, workers: int, breaker: CircuitBreaker):
+        self.breaker = breaker
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='delivery'
         )
-        .iterator(chunk_size=10)
-    )
-    count = 0
-    for job in pending_jobs:
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def get_connection(self) -> BaseEmailBackend:
+        """Returns the email connection of the current worker thread."""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = get_connection()
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def deliver(self, message: Message) -> bool:
+        """Sends a message without touching the database, run in a worker thread.
+
+        Args:
+            message (Message): The message to send.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker opened before the message was sent.
+
+        Returns:
+            bool: True if the message was sent successfully, otherwise False.
+        """
+        if self.breaker.is_open:
+            raise CircuitOpenError()
         try:
-            logger.debug(f'Processing job #{job.id}')
-            job.is_completed = job.message.send()
+            is_sent = send_message(message, self.get_connection(), commit=False)
+        except Exception as error:
+            self.breaker.record(error)
+            raise
+        self.breaker.record()
+        return is_sent
+
+    def submit(self, job: Job):
+        """Schedules delivery of the job's message on the pool."""
+        return self.executor.submit(self.deliver, job.message)
+
+    def close(self):
+        """Waits for the workers to finish and closes their email connections."""
+        self.executor.shutdown(wait=True)
+        for connection in self.connections:
+            connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def save_processed_jobs(jobs: list[Job]) -> list[Job]:
+    """Saves the outcomes of a chunk of processed jobs in a single transaction.
+
+    Messages, their recipients and jobs are bulk updated and the delivery activity logs
+    otherwise created by
+    the job signals are bulk created. If the batch fails, jobs are saved one by one so that
+    a single failure does not lose the outcomes of the whole chunk.
+
+    Args:
+        jobs (list[Job]): The processed jobs with their updated messages.
+
+    Returns:
+        list[Job]: The jobs successfully saved.
+    """
+    if not jobs:
+        return []
+    now = timezone.now()
+    # recipients are prefetched, so their delivery statuses are kept on the messages
+    recipients = {job.id: list(job.message.recipient_set.all()) for job in jobs}
+    for job in jobs:
+        # bulk updates do not set auto_now fields
+        job.updated_at = job.message.updated_at = now
+        for recipient in recipients[job.id]:
+            recipient.updated_at = now
+    try:
+        with transaction.atomic():
+            Message.objects.bulk_update(
+                [job.message for job in jobs], ['status', 'updated_at']
+            )
+            MessageRecipient.objects.bulk_update(
+                [recipient for job in jobs for recipient in recipients[job.id]],
+                ['status', 'updated_at'],
+            )
+            Job.objects.bulk_update(jobs, JOB_OUTCOME_FIELDS)
+            ActivityLog.objects.bulk_create(
+                build_message_activity_log(
+                    job.message, ActivityLog.Type.MESSAGE_DELIVERED
+                )
+                for job in jobs
+                if job.is_completed
+            )
+        # bulk updates do not send signals, so the statistics are invalidated here
+        invalidate_message_stats(job.message.user_id for job in jobs)
+        return jobs
+    except Exception:
+        logger.exception('Failed to save processed jobs, saving one by one')
+
+    saved = []
+    for job in jobs:
+        try:
+            # update the status directly as it bypasses the scheduling rules of retries
+            Message.objects.filter(pk=job.message_id).update(
+                status=job.message.status, updated_at=now
+            )
+            MessageRecipient.objects.bulk_update(
+                recipients[job.id], ['status', 'updated_at']
+            )
             # save relevant fields triggering signals
-            job.save(update_fields=['is_completed', 'updated_at'])
-            logger.debug(f'Processed job #{job.id}')
-            count += 1
+            job.save(update_fields=JOB_OUTCOME_FIELDS)
+            saved.append(job)
         except Exception:
             logger.exception(f'Failed to process job {job.id}')
+    invalidate_message_stats(job.message.user_id for job in saved)
+    return saved
+
+
+def get_worker_id() -> str:
+    """Returns a unique identifier of the current worker used as lease owner."""
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def process_pending_jobs():
+    """Send messages for all non-complete pending jobs."""
+    owner = get_worker_id()
+    lease = timedelta(seconds=settings.DELIVERY_LEASE_SECONDS)
+    breaker = CircuitBreaker(threshold=settings.DELIVERY_BREAKER_THRESHOLD)
+    cooldown = timedelta(seconds=settings.DELIVERY_BREAKER_COOLDOWN_SECONDS)
+    count = 0
+    with DeliveryPool(workers=settings.DELIVERY_WORKERS, breaker=breaker) as pool:
+        while not breaker.is_open:
+            # claim a chunk of due jobs so that concurrent runs never overlap
+            chunk = list(
+                Job.objects.pending()
+                .select_related('message', 'message__user')
+                .prefetch_related('message__recipient_set')
+                .claim(owner=owner, limit=CHUNK_SIZE, duration=lease)
+            )
+            if not chunk:
+                break
+            futures = {pool.submit(job): job for job in chunk}
+            cooldown_until = timezone.now() + cooldown
+            # the calling thread is the single writer of delivery outcomes
+            processed, failed = [], set()
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    logger.debug(f'Processing job #{job.id}')
+                    job.is_completed = future.result()
+                except CircuitOpenError:
+                    # release jobs skipped by the open circuit breaker after the cool-down
+                    job.lease_owner = job.lease_expires_at = None
+                    job.next_attempt_at = cooldown_until
+                    processed.append(job)
+                    failed.add(job.id)
+                    continue
+                except Exception:
+                    logger.exception(f'Failed to process job {job.id}')
+                    failed.add(job.id)
+                if job.is_completed:
+                    job.lease_owner = job.lease_expires_at = None
+                elif not job.schedule_retry():
+                    logger.warning(
+                        f'Job #{job.id} failed after {job.attempts} attempts'
+                    )
+                processed.append(job)
+            for job in save_processed_jobs(processed):
+                if job.id not in failed:
+                    logger.debug(f'Processed job #{job.id}')
+                    count += 1
+    if breaker.is_open:
+        # keep the breaker open across runs, so that the due jobs left unclaimed do not
+        # start the next run right away and wait out the same connection timeouts
+        Job.objects.pending().unleased().update(
+            next_attempt_at=timezone.now() + cooldown
+        )
+        logger.warning('Stopped processing jobs after consecutive connection failures')
+    # keep the indexed lower bound of the final words ahead of the users' check-ins
+    Job.objects.advance_final_words()
     logger.info(f'Processed {count} jobs')
@@ -1,15 +1,31 @@
+import os
+import smtplib
+import tempfile
 from datetime import datetime, timedelta
+from pathlib import Path
+from smtplib import SMTPConnectError, SMTPRecipientsRefused, SMTPServerDisconnected
 from typing import Callable
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.utils.timezone import now, timedelta
 
 from accounts.models import User
+from cron.benchmark import BACKENDS, SMTPSink, run_benchmark
 from cron.models import Job
-from cron.tasks import process_pending_jobs
-from web.models import ActivityLog, Message
+from cron.scheduler import Scheduler, wake_event, wake_scheduler
+from cron.tasks import (
+    CircuitBreaker,
+    is_connection_error,
+    process_pending_jobs,
+    send_message,
+)
+from web.models import ActivityLog, Message, MessageRecipient
+from web.stats import get_message_stats
 
 
 class TaskTests(TestCase):
@@ -19,6 +35,7 @@ class TaskTests(TestCase):
         """Set up test data."""
         self.user = User.objects.create_user(email='user@test.com', password='foobar')
         self.scheduled_at = now() + timedelta(days=10)
+        cache.clear()
 
     @patch('cron.tasks.logger')
     def test_process_pending_jobs(self, mock_logger: Callable[[str], None]):
@@ -76,6 +93,440 @@ class TaskTests(TestCase):
             self.assertFalse(job.is_completed)
             mock_logger.exception.assert_called_with(f'Failed to process job {job.id}')
 
+    @override_settings(DELIVERY_WORKERS=1)
+    @patch('cron.tasks.get_connection')
+    def test_process_pending_jobs_reuses_connection(self, mock_get_connection):
+        """Test that a single email connection is shared across all jobs in a run.
+
+        Args:
+            mock_get_connection (MagicMock): Mocked get_connection function.
+        """
+        # Given
+        for i in range(3):
+            message = Message.objects.create(
+                user=self.user,
+                type=Message.Type.TIME_CAPSULE,
+                recipients=f'user{i}@test.com',
+                subject='Test Subject',
+                text='Test text',
+                scheduled_at=self.scheduled_at,
+            )
+            Job.objects.filter(message=message).update(
+                scheduled_at=timezone.now() - timedelta(days=1)
+            )
+        with patch('web.models.Message.send') as mock_send:
+            mock_send.return_value = True
+            # When
+            process_pending_jobs()
+            # Then
+            mock_get_connection.assert_called_once()
+            connection = mock_get_connection.return_value
+            for call in mock_send.call_args_list:
+                self.assertIs(call.kwargs['connection'], connection)
+            connection.close.assert_called_once()
+        self.assertEqual(Job.objects.filter(is_completed=True).count(), 3)
+
+    @override_settings(DELIVERY_WORKERS=2)
+    @patch('cron.tasks.get_connection')
+    def test_process_pending_jobs_concurrent(self, mock_get_connection):
+        """Test that workers own their connections and outcomes are saved by the caller.
+
+        Args:
+            mock_get_connection (MagicMock): Mocked get_connection function.
+        """
+        # Given
+        mock_get_connection.side_effect = lambda: MagicMock()
+        for i in range(12):
+            message = Message.objects.create(
+                user=self.user,
+                type=Message.Type.TIME_CAPSULE,
+                recipients=f'user{i}@test.com',
+                subject='Test Subject',
+                text='Test text',
+                scheduled_at=self.scheduled_at,
+            )
+            Job.objects.filter(message=message).update(
+                scheduled_at=timezone.now() - timedelta(days=1)
+            )
+
+        def send(self, **kwargs):
+            self.status = Message.Status.DELIVERED
+            return True
+
+        with patch.object(Message, 'send', send):
+            # When
+            process_pending_jobs()
+        # Then
+        self.assertLessEqual(mock_get_connection.call_count, 2)
+        self.assertEqual(Job.objects.filter(is_completed=True).count(), 12)
+        self.assertEqual(
+            Message.objects.filter(status=Message.Status.DELIVERED).count(), 12
+        )
+
+    def test_send_message_reconnects(self):
+        """Test that a dropped connection is reopened and the send retried once."""
+        # Given
+        connection = MagicMock()
+        message = MagicMock()
+        message.send.side_effect = [SMTPServerDisconnected(), True]
+        # When
+        is_sent = send_message(message, connection)
+        # Then
+        self.assertTrue(is_sent)
+        self.assertEqual(message.send.call_count, 2)
+        connection.close.assert_called_once()
+        self.assertEqual(connection.open.call_count, 2)
+
+    @patch('cron.tasks.logger')
+    def test_process_pending_jobs_skips_leased(
+        self, mock_logger: Callable[[str], None]
+    ):
+        """Test that jobs leased by another worker are not processed.
+
+        Args:
+            mock_logger (Callable[[str], None]): Mocked logger instance.
+        """
+        # Given
+        message = Message.objects.create(
+            user=self.user,
+            type=Message.Type.TIME_CAPSULE,
+            recipients='user1@test.com',
+            subject='Test Subject',
+            text='Test text',
+            scheduled_at=self.scheduled_at,
+        )
+        Job.objects.filter(message=message).update(
+            scheduled_at=timezone.now() - timedelta(days=1),
+            lease_owner='other-worker',
+            lease_expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        with patch('web.models.Message.send') as mock_send:
+            # When
+            process_pending_jobs()
+            # Then
+            mock_send.assert_not_called()
+            mock_logger.info.assert_called_with('Processed 0 jobs')
+
+    def create_due_jobs(self, count: int) -> list[Message]:
+        """Creates time capsule messages whose jobs are due.
+
+        Args:
+            count (int): The number of messages to create.
+
+        Returns:
+            list[Message]: The created messages.
+        """
+        messages = []
+        for i in range(count):
+            message = Message.objects.create(
+                user=self.user,
+                type=Message.Type.TIME_CAPSULE,
+                recipients=f'user{i}@test.com',
+                subject=f'Test Subject {i}',
+                text='Test text',
+                scheduled_at=self.scheduled_at,
+            )
+            Job.objects.filter(message=message).update(
+                scheduled_at=timezone.now() - timedelta(days=1)
+            )
+            messages.append(message)
+        return messages
+
+    def test_process_pending_jobs_activity_logs(self):
+        """Test that batched saves create the same activity logs as the job signals."""
+        # Given
+        messages = self.create_due_jobs(3)
+        self.assertEqual(
+            get_message_stats(self.user.id)['delivered']['TIME_CAPSULE'], 0
+        )
+        # When
+        process_pending_jobs()
+        # Then
+        self.assertEqual(
+            get_message_stats(self.user.id)['delivered']['TIME_CAPSULE'], 3
+        )
+        delivered = ActivityLog.objects.filter(
+            type=ActivityLog.Type.MESSAGE_DELIVERED
+        ).order_by('description')
+        self.assertEqual(
+            [(log.user_id, log.description) for log in delivered],
+            [
+                (self.user.id, f'Time capsule - "{message.subject}" delivered.')
+                for message in messages
+            ],
+        )
+        self.assertFalse(
+            Message.objects.exclude(status=Message.Status.DELIVERED).exists()
+        )
+        self.assertFalse(Job.objects.filter(is_completed=False).exists())
+        self.assertFalse(
+            MessageRecipient.objects.exclude(
+                status=MessageRecipient.Status.DELIVERED
+            ).exists()
+        )
+
+    @override_settings(DELIVERY_WORKERS=1)
+    def test_process_pending_jobs_query_count(self):
+        """Test that the queries to save a chunk do not grow with its size."""
+        # Given
+        self.create_due_jobs(2)
+        with CaptureQueriesContext(connection) as small:
+            process_pending_jobs()
+        self.create_due_jobs(8)
+        # When
+        with CaptureQueriesContext(connection) as large:
+            process_pending_jobs()
+        # Then
+        self.assertEqual(len(small), len(large))
+
+    @patch('cron.tasks.logger')
+    def test_process_pending_jobs_batch_fallback(
+        self, mock_logger: Callable[[str], None]
+    ):
+        """Test that jobs are saved one by one if the batched save fails.
+
+        Args:
+            mock_logger (Callable[[str], None]): Mocked logger instance.
+        """
+        # Given
+        self.create_due_jobs(2)
+        with patch.object(
+            ActivityLog.objects, 'bulk_create', side_effect=Exception('Failed')
+        ):
+            # When
+            process_pending_jobs()
+        # Then
+        mock_logger.info.assert_called_with('Processed 2 jobs')
+        self.assertFalse(Job.objects.filter(is_completed=False).exists())
+        self.assertEqual(
+            ActivityLog.objects.filter(type=ActivityLog.Type.MESSAGE_DELIVERED).count(),
+            2,
+        )
+
+    def test_process_pending_jobs_retry(self):
+        """Test that a failed delivery is scheduled for a retry instead of failing."""
+        # Given
+        message = self.create_due_jobs(1)[0]
+        with patch('web.models.Message.send') as mock_send:
+            mock_send.return_value = False
+            # When
+            process_pending_jobs()
+            # Then
+            mock_send.assert_called_once()
+        job = Job.objects.select_related('message').get(message=message)
+        self.assertFalse(job.is_completed)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.next_attempt_at, timezone.now())
+        self.assertIsNone(job.lease_owner)
+        self.assertEqual(job.message.status, Message.Status.SCHEDULED)
+        self.assertFalse(Job.objects.pending().exists())
+
+    @override_settings(DELIVERY_WORKERS=1, DELIVERY_BREAKER_THRESHOLD=2)
+    @patch('cron.tasks.logger')
+    def test_process_pending_jobs_circuit_breaker(
+        self, mock_logger: Callable[[str], None]
+    ):
+        """Test that a run stops early after consecutive connection failures.
+
+        Args:
+            mock_logger (Callable[[str], None]): Mocked logger instance.
+        """
+        # Given
+        self.create_due_jobs(12)  # more than a chunk, leaving due jobs unclaimed
+        with patch('web.models.Message.send') as mock_send:
+            mock_send.side_effect = SMTPConnectError(421, 'Service not available')
+            # When
+            process_pending_jobs()
+            # Then
+            self.assertEqual(mock_send.call_count, 2)
+        mock_logger.warning.assert_called_with(
+            'Stopped processing jobs after consecutive connection failures'
+        )
+        mock_logger.info.assert_called_with('Processed 0 jobs')
+        self.assertEqual(Job.objects.filter(attempts=1).count(), mock_send.call_count)
+        self.assertFalse(Job.objects.filter(lease_owner__isnull=False).exists())
+        # the skipped jobs cool down instead of starting the next run right away
+        self.assertFalse(Job.objects.pending().exists())
+        self.assertFalse(
+            Job.objects.filter(
+                attempts=0, next_attempt_at__lt=timezone.now() + timedelta(seconds=60)
+            ).exists()
+        )
+
+    def test_is_connection_error(self):
+        """Test telling connection errors apart from other delivery errors."""
+        # Then
+        self.assertTrue(is_connection_error(SMTPConnectError(421, 'Unavailable')))
+        self.assertTrue(is_connection_error(SMTPServerDisconnected()))
+        self.assertTrue(is_connection_error(TimeoutError()))
+        self.assertFalse(is_connection_error(SMTPRecipientsRefused({})))
+        self.assertFalse(is_connection_error(ValueError()))
+
+    def test_circuit_breaker(self):
+        """Test that the breaker opens on consecutive connection failures only."""
+        # Given
+        breaker = CircuitBreaker(threshold=2)
+        # When
+        breaker.record(TimeoutError())
+        breaker.record()
+        breaker.record(TimeoutError())
+        # Then
+        self.assertFalse(breaker.is_open)
+        # When
+        breaker.record(ValueError())
+        breaker.record(TimeoutError())
+        # Then
+        self.assertTrue(breaker.is_open)
+
+
+class ModelTests(TestCase):
+    """Test the models in the cron app."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(email='user@test.com', password='foobar')
+        for i in range(3):
+            message = Message.objects.create(
+                user=self.user,
+                type=Message.Type.TIME_CAPSULE,
+                recipients=f'user{i}@test.com',
+                subject='Test Subject',
+                text='Test text',
+                scheduled_at=now() + timedelta(days=10),
+            )
+            Job.objects.filter(message=message).update(
+                scheduled_at=timezone.now() - timedelta(days=1)
+            )
+        self.lease = timedelta(minutes=5)
+
+    def test_claim_jobs_without_overlap(self):
+        """Test that concurrent claims never return the same job."""
+        # When
+        first = set(Job.objects.pending().claim('a', limit=2, duration=self.lease))
+        second = set(Job.objects.pending().claim('b', limit=10, duration=self.lease))
+        third = set(Job.objects.pending().claim('c', limit=10, duration=self.lease))
+        # Then
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertEqual(len(third), 0)
+        self.assertFalse(first & second)
+        self.assertEqual(Job.objects.filter(lease_owner='a').count(), 2)
+
+    def test_claim_jobs_race(self):
+        """Test that a worker losing a race for jobs claims the remaining ones."""
+        # Given
+        raced = []
+
+        def claim_first(execute, sql, params, many, context):
+            # another worker claims two jobs right before this worker's claim runs
+            if sql.startswith('UPDATE "cron_job"') and not raced:
+                raced.append(True)
+                raced.extend(
+                    Job.objects.pending().claim('a', limit=2, duration=self.lease)
+                )
+            return execute(sql, params, many, context)
+
+        # When
+        with connection.execute_wrapper(claim_first):
+            claimed = set(
+                Job.objects.pending().claim('b', limit=2, duration=self.lease)
+            )
+        # Then
+        self.assertEqual(len(raced), 3)
+        self.assertEqual(len(claimed), 1)
+        self.assertFalse(claimed & set(raced[1:]))
+
+    @override_settings(
+        DELIVERY_MAX_ATTEMPTS=3,
+        DELIVERY_RETRY_BASE_SECONDS=60,
+        DELIVERY_RETRY_MAX_SECONDS=90,
+    )
+    def test_schedule_retry(self):
+        """Test exponential backoff of retries until the attempts are exhausted."""
+        # Given
+        job = Job.objects.select_related('message').first()
+        # When
+        self.assertTrue(job.schedule_retry())
+        # Then
+        delay = (job.next_attempt_at - timezone.now()).total_seconds()
+        self.assertTrue(29 <= delay <= 60)
+        # When
+        self.assertTrue(job.schedule_retry())
+        # Then
+        delay = (job.next_attempt_at - timezone.now()).total_seconds()
+        self.assertTrue(44 <= delay <= 90)
+        self.assertEqual(job.message.status, Message.Status.SCHEDULED)
+        # When
+        self.assertFalse(job.schedule_retry())
+        # Then
+        self.assertEqual(job.attempts, 3)
+        self.assertIsNone(job.next_attempt_at)
+        self.assertEqual(job.message.status, Message.Status.FAILED)
+
+    def test_pending_final_word(self):
+        """Test that final words are pending until the user checks in."""
+        # Given
+        self.user.interval = 2
+        self.user.last_checkin = now() - timedelta(days=3, minutes=1)
+        self.user.save()
+        message = Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='user1@test.com',
+            subject='Test Subject',
+            text='Test text',
+            delay=1,
+        )
+        # Then
+        self.assertTrue(Job.objects.pending().filter(message=message).exists())
+        # When
+        self.user.last_checkin = now()
+        self.user.save()
+        # Then
+        self.assertFalse(Job.objects.pending().filter(message=message).exists())
+
+    def test_advance_final_words(self):
+        """Test that final words not due yet are moved forward past the last check-in."""
+        # Given
+        self.user.interval = 2
+        self.user.last_checkin = now() - timedelta(days=3, minutes=1)
+        self.user.save()
+        message = Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='user1@test.com',
+            subject='Test Subject',
+            text='Test text',
+            delay=1,
+        )
+        jobs = Job.objects.filter(message=message).values_list(
+            'scheduled_at', flat=True
+        )
+        scheduled_at = jobs.get()
+        self.user.last_checkin = now()
+        self.user.save()
+        # When
+        with self.assertNumQueries(1):
+            advanced = Job.objects.advance_final_words()
+        # Then
+        self.assertEqual(advanced, 1)
+        self.assertEqual(jobs.get(), self.user.last_checkin + timedelta(days=1))
+        self.assertGreater(jobs.get(), scheduled_at)
+        self.assertEqual(Job.objects.advance_final_words(), 0)
+
+    def test_claim_expired_lease(self):
+        """Test that jobs with an expired lease are reclaimed."""
+        # Given
+        Job.objects.update(
+            lease_owner='crashed',
+            lease_expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        # When
+        claimed = Job.objects.pending().claim('a', limit=10, duration=self.lease)
+        # Then
+        self.assertEqual(len(claimed), 3)
+        self.assertFalse(Job.objects.filter(lease_owner='crashed').exists())
+
 
 class SignalTests(TestCase):
     """Test the signals in the cron app."""
@@ -85,9 +536,11 @@ class SignalTests(TestCase):
         self.user = User.objects.create_user(email='user@test.com', password='foobar')
         self.scheduled_at = now() + timedelta(days=10)
 
-    def test_update_jobs_on_checkin(self):
-        """Test updating jobs on user check-in."""
+    def test_checkin_moves_due_time(self):
+        """Test that a check-in moves the due time of jobs without writing to them."""
         # Given
+        self.user.interval = 10
+        self.user.save()
         message = Message.objects.create(
             user=self.user,
             type=Message.Type.FINAL_WORD,
@@ -97,17 +550,18 @@ class SignalTests(TestCase):
             delay=30,
         )
         initial_job = Job.objects.get(message=message)
-        ActivityLog.objects.create(
-            user=self.user,
-            type=ActivityLog.Type.CHECKED_IN,
-        )
         # When
-        updated_job = Job.objects.get(pk=initial_job.pk)
+        self.user.last_checkin = timezone.now() + timedelta(days=5)
+        with CaptureQueriesContext(connection) as queries:
+            self.user.save()
+        updated_job = Job.objects.with_due_at().get(pk=initial_job.pk)
         # Then
-        self.assertNotEqual(initial_job.scheduled_at, updated_job.scheduled_at)
-        expected_schedule = timezone.now() + timedelta(days=30)
-        self.assertAlmostEqual(
-            updated_job.scheduled_at.timestamp(), expected_schedule.timestamp(), delta=5
+        self.assertEqual(initial_job.scheduled_at, updated_job.scheduled_at)
+        self.assertEqual(
+            updated_job.due_at, self.user.last_checkin + timedelta(days=40)
+        )
+        self.assertFalse(
+            any('"cron_job"' in query['sql'] for query in queries.captured_queries)
         )
 
     def test_update_jobs_on_checkin_ignores_time_capsule(self):
@@ -165,21 +619,24 @@ class SignalTests(TestCase):
             text='Test text',
             delay=30,
         )
-        job = Job.objects.get(message=message)
+        job = Job.objects.with_due_at().get(message=message)
         now = timezone.now()
         expected_schedule = now + timedelta(days=40)
         self.assertAlmostEqual(
-            job.scheduled_at.timestamp(), expected_schedule.timestamp(), delta=5
+            job.due_at.timestamp(), expected_schedule.timestamp(), delta=5
         )
         # When
         self.user.interval = 20
-        self.user.save()
-        job.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        job = Job.objects.with_due_at().get(message=message)
         expected_schedule = now + timedelta(days=50)
         # Then
         self.assertAlmostEqual(
-            job.scheduled_at.timestamp(), expected_schedule.timestamp(), delta=5
+            job.due_at.timestamp(), expected_schedule.timestamp(), delta=5
         )
+        self.assertTrue(wake_event.is_set())
+        wake_event.clear()
 
     def test_post_save_message_time_capsule(self):
         """Test post-save signal for time capsule messages."""
@@ -228,6 +685,73 @@ class SignalTests(TestCase):
             job.scheduled_at.timestamp(), expected_schedule.timestamp(), delta=5
         )
 
+    @patch('cron.signals.wake_scheduler')
+    def test_post_save_message_deferred_fields(self, mock_wake: Callable[[], None]):
+        """Test that loading a deferred field keeps the unsaved change to the delay.
+
+        Args:
+            mock_wake (Callable[[], None]): Mocked wake_scheduler function.
+        """
+        # Given
+        message = Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='user1@test.com',
+            subject='Test Subject',
+            text='Test text',
+            delay=30,
+        )
+        message = Message.objects.only('id', 'delay').get(pk=message.pk)
+        # When
+        message.delay = 9
+        self.assertEqual(message.subject, 'Test Subject')
+        with self.captureOnCommitCallbacks(execute=True):
+            message.save()
+        # Then
+        job = Job.objects.get(message=message)
+        expected_schedule = timezone.now() + timedelta(days=9)
+        self.assertAlmostEqual(
+            job.scheduled_at.timestamp(), expected_schedule.timestamp(), delta=5
+        )
+        mock_wake.assert_called_once()
+
+    def test_reschedule_final_words_single_query(self):
+        """Test that rescheduling runs a single query however many jobs there are."""
+        # Given
+        messages = [
+            Message.objects.create(
+                user=self.user,
+                type=Message.Type.FINAL_WORD,
+                recipients='user1@test.com',
+                subject='Test Subject',
+                text='Test text',
+                delay=delay,
+            )
+            for delay in range(1, 6)
+        ]
+        Job.objects.update(scheduled_at=self.scheduled_at)
+        # When
+        with self.assertNumQueries(1):
+            count = Job.objects.filter(message__user=self.user).reschedule_final_words()
+        # Then
+        self.assertEqual(count, 5)
+        self.user.refresh_from_db()
+        for message in messages:
+            self.assertEqual(
+                Job.objects.get(message=message).scheduled_at,
+                self.user.last_checkin + timedelta(days=message.delay),
+            )
+        # When
+        messages[0].delay = 10
+        with CaptureQueriesContext(connection) as queries:
+            messages[0].save()
+        # Then
+        job_queries = [
+            query for query in queries.captured_queries if '"cron_job"' in query['sql']
+        ]
+        self.assertEqual(len(job_queries), 1)
+        self.assertTrue(job_queries[0]['sql'].startswith('UPDATE'))
+
     def test_job_completion_creates_activity_log(self):
         """Test that job completion creates an activity log."""
         # Given
@@ -273,6 +797,23 @@ class SignalTests(TestCase):
         ).first()
         self.assertIsNotNone(deletion_log)
 
+    def test_user_deletion_deletes_messages(self):
+        """Test that deleting a user deletes its messages without logging them."""
+        # Given
+        Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='user1@test.com',
+            subject='Test Subject',
+            text='Test text',
+            delay=10,
+        )
+        # When
+        self.user.delete()
+        # Then
+        self.assertFalse(Message.objects.exists())
+        self.assertFalse(ActivityLog.objects.exists())
+
     def test_job_incomplete_doesnt_create_activity_log(self):
         """Test that incomplete jobs do not create an activity log."""
         # Given
@@ -293,3 +834,172 @@ class SignalTests(TestCase):
         job.save()
         # Then
         self.assertEqual(ActivityLog.objects.count(), 2)
+
+
+class SchedulerTests(TestCase):
+    """Test the deadline driven scheduler in the cron app."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(email='user@test.com', password='foobar')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.wake_file = Path(directory.name) / 'scheduler.wake'
+        settings = override_settings(SCHEDULER_WAKE_FILE=self.wake_file)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        wake_event.clear()
+        self.scheduler = Scheduler(
+            horizon=timedelta(hours=1), poll_interval=0.01, backoff=0.01
+        )
+
+    def create_message(self, scheduled_at: datetime) -> Message:
+        """Creates a time capsule message whose job is scheduled at the given time."""
+        message = Message.objects.create(
+            user=self.user,
+            type=Message.Type.TIME_CAPSULE,
+            recipients='user1@test.com',
+            subject='Test Subject',
+            text='Test text',
+            scheduled_at=now() + timedelta(days=10),
+        )
+        Job.objects.filter(message=message).update(scheduled_at=scheduled_at)
+        return message
+
+    def test_load_deadlines(self):
+        """Test that only deadlines within the horizon are loaded in order."""
+        # Given
+        later = now() + timedelta(minutes=30)
+        sooner = now() + timedelta(minutes=10)
+        leased = now() - timedelta(minutes=1)
+        self.create_message(later)
+        self.create_message(sooner)
+        self.create_message(now() + timedelta(days=2))
+        lease_expires_at = now() + timedelta(minutes=20)
+        Job.objects.filter(message=self.create_message(leased)).update(
+            lease_owner='other-worker', lease_expires_at=lease_expires_at
+        )
+        # When
+        self.scheduler.load()
+        # Then
+        self.assertEqual(len(self.scheduler.heap), 3)
+        self.assertEqual(self.scheduler.next_deadline(), sooner)
+        deadlines = sorted(deadline for deadline, _ in self.scheduler.heap)
+        self.assertEqual(deadlines, [sooner, lease_expires_at, later])
+
+    @patch('cron.scheduler.process_pending_jobs')
+    def test_tick_processes_due_jobs(self, mock_process: Callable[[], None]):
+        """Test that pending jobs are processed once the earliest deadline has passed.
+
+        Args:
+            mock_process (Callable[[], None]): Mocked process_pending_jobs function.
+        """
+        # Given
+        self.create_message(now() - timedelta(seconds=1))
+        self.scheduler.load()
+        # When
+        self.scheduler.tick()
+        # Then
+        mock_process.assert_called_once()
+
+    @patch('cron.scheduler.process_pending_jobs')
+    def test_tick_woken_before_deadline(self, mock_process: Callable[[], None]):
+        """Test that a wake-up reloads the deadlines without processing jobs.
+
+        Args:
+            mock_process (Callable[[], None]): Mocked process_pending_jobs function.
+        """
+        # Given
+        self.create_message(now() + timedelta(minutes=30))
+        self.scheduler.load()
+        self.scheduler.is_woken()
+        due = now() + timedelta(seconds=5)
+        self.create_message(due)
+        # When
+        wake_scheduler()
+        self.scheduler.tick()
+        # Then
+        mock_process.assert_not_called()
+        self.assertEqual(self.scheduler.next_deadline(), due)
+
+    @patch('cron.scheduler.logger')
+    @patch('cron.scheduler.process_pending_jobs')
+    def test_run_survives_failure(
+        self, mock_process: Callable[[], None], mock_logger: Callable[[str], None]
+    ):
+        """Test that a failed iteration is logged and retried instead of stopping the run.
+
+        Args:
+            mock_process (Callable[[], None]): Mocked process_pending_jobs function.
+            mock_logger (Callable[[str], None]): Mocked logger.
+        """
+        # Given
+        self.create_message(now() - timedelta(seconds=1))
+        errors = [OperationalError('database is locked')]
+
+        def process():
+            if errors:
+                raise errors.pop()
+            self.scheduler.stop()
+
+        mock_process.side_effect = process
+        # When
+        self.scheduler.run()
+        # Then
+        self.assertEqual(mock_process.call_count, 2)
+        mock_logger.exception.assert_called_once_with('Scheduler iteration failed')
+
+    def test_wake_file(self):
+        """Test that touching the wake file wakes a scheduler in another process."""
+        # Given
+        self.scheduler.is_woken()
+        self.assertTrue(self.wake_file.exists())
+        self.assertFalse(self.scheduler.is_woken())
+        # When
+        modified = self.wake_file.stat().st_mtime + 1
+        with patch('cron.scheduler.os.utime') as mock_utime:
+            wake_scheduler()
+            mock_utime.assert_called_once_with(self.wake_file)
+        wake_event.clear()
+        os.utime(self.wake_file, (modified, modified))
+        # Then
+        self.assertTrue(self.scheduler.is_woken())
+
+    def test_message_save_wakes_scheduler(self):
+        """Test that creating a message wakes the scheduler once committed."""
+        # When
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_message(now() + timedelta(minutes=5))
+        # Then
+        self.assertTrue(wake_event.is_set())
+
+
+class BenchmarkTests(TestCase):
+    @patch('cron.tasks.logger')
+    def test_run_benchmark(self, mock_logger: Callable[[str], None]):
+        """Test benchmarking delivery against both email backends."""
+        for backend in BACKENDS:
+            # When
+            result = run_benchmark(
+                backend=backend, messages=3, users=2, recipients=2, workers=2
+            )
+            # Then
+            self.assertEqual(result['backend'], backend)
+            self.assertEqual(result['delivered'], 3)
+            self.assertGreater(result['messages_per_second'], 0)
+            self.assertLessEqual(result['latency_p50_ms'], result['latency_p99_ms'])
+            self.assertGreater(result['queries_per_job'], 0)
+
+    def test_smtp_sink(self):
+        """Test that the SMTP sink accepts messages sent over SMTP."""
+        # When
+        with SMTPSink.serve() as sink:
+            with smtplib.SMTP('127.0.0.1', sink.port) as client:
+                refused = client.sendmail(
+                    'sender@test.com',
+                    ['a@test.com', 'b@test.com'],
+                    'Subject: Hi\r\n\r\nHi',
+                )
+        # Then
+        self.assertEqual(refused, {})
+        self.assertEqual(sink.received, 1)
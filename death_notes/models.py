@@ -0,0 +1,75 @@
+from typing import Any, Iterable, Optional
+
+
+class FieldTrackingMixin:
+    """Model mixin tracking changes to fields without querying their previous values.
+
+    The values of the fields listed in tracked_fields are snapshotted when an instance is
+    loaded from the database, and those of the loaded or saved fields again after every
+    refresh or save, so signal handlers can compare against the stored values. Fields
+    deferred when loading are not snapshotted.
+    """
+
+    tracked_fields: tuple[str, ...] = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.snapshot()
+        return instance
+
+    def snapshot(self, fields: Optional[Iterable[str]] = None):
+        """Records the current values of the loaded tracked fields.
+
+        Args:
+            fields (Optional[Iterable[str]]): The fields that were loaded or saved, all the
+                loaded tracked fields if None. The other fields keep their stored values.
+        """
+        tracked_fields = self.tracked_fields
+        if fields is not None:
+            fields = set(fields)
+            tracked_fields = [field for field in tracked_fields if field in fields]
+        self._snapshot = {
+            **getattr(self, '_snapshot', {}),
+            **{
+                field: self.__dict__[field]
+                for field in tracked_fields
+                if field in self.__dict__
+            },
+        }
+
+    def previous(self, field: str) -> Any:
+        """Returns the stored value of a tracked field.
+
+        Args:
+            field (str): The name of the tracked field.
+
+        Returns:
+            Any: The value when the instance was loaded or last saved, None if unknown.
+        """
+        return getattr(self, '_snapshot', {}).get(field)
+
+    def has_changed(self, field: str) -> bool:
+        """Checks whether a tracked field differs from its stored value.
+
+        Args:
+            field (str): The name of the tracked field.
+
+        Returns:
+            bool: True if the field was changed or its stored value is unknown.
+        """
+        snapshot = getattr(self, '_snapshot', {})
+        if field not in snapshot:
+            return True
+        return snapshot[field] != getattr(self, field)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # post_save handlers have compared against the stored values at this point, only
+        # the saved fields are stored so unsaved changes to the others are still tracked
+        self.snapshot(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # a deferred field is loaded with fields, the changes to the others are kept
+        self.snapshot(fields)
@@ -1,9 +1,9 @@
 from urllib.parse import parse_qs, urlencode, urlparse
 
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
 
 
-class CustomLimitOffsetPagination(LimitOffsetPagination):
+class RelativeLinksMixin:
     def _format_link(self, url):
         if not url:
             return None
@@ -16,3 +16,34 @@ class CustomLimitOffsetPagination(LimitOffsetPagination):
 
     def get_previous_link(self):
         return self._format_link(super().get_previous_link())
+
+
+class CustomLimitOffsetPagination(RelativeLinksMixin, LimitOffsetPagination):
+    pass
+
+
+class CustomCursorPagination(RelativeLinksMixin, CursorPagination):
+    """Keyset pagination on the newest first, without counting the results."""
+
+    ordering = '-id'
+    page_size_query_param = 'limit'
+
+
+class OptionalCursorPagination(CustomLimitOffsetPagination):
+    """Limit offset pagination, or cursor pagination when the cursor parameter is passed.
+
+    Clients opt in with an empty ?cursor= for the first page and follow the opaque next and
+    previous links. This avoids the OFFSET scan and the COUNT query of deep pages.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if CustomCursorPagination.cursor_query_param in request.query_params:
+            self.cursor_pagination = CustomCursorPagination()
+            return self.cursor_pagination.paginate_queryset(queryset, request, view)
+        self.cursor_pagination = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
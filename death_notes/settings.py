@@ -89,13 +89,59 @@ WSGI_APPLICATION = 'death_notes.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# pragmas applied to every new SQLite connection, so that the web and qcluster processes
+# sharing the database file can read while the other one writes
+SQLITE_PRAGMAS = {
+    'journal_mode': config('SQLITE_JOURNAL_MODE', default='WAL'),
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+    # time a connection waits for a lock before raising "database is locked" (in ms)
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=128 * 1024 * 1024, cast=int),
+    # page cache per connection, negative values are in KiB
+    'cache_size': config('SQLITE_CACHE_SIZE', default=-20000, cast=int),
+    'temp_store': config('SQLITE_TEMP_STORE', default='MEMORY'),
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # seconds a connection is kept open across requests, 0 closes it after each one.
+        # Under ASGI each request gets its own connection, which is then never reused
+        'CONN_MAX_AGE': config('DATABASE_CONN_MAX_AGE', default=0, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(
+                f'PRAGMA {pragma}={value}' for pragma, value in SQLITE_PRAGMAS.items()
+            ),
+            # IMMEDIATE takes the write lock when a transaction begins, so that writers
+            # wait for the busy timeout instead of failing when upgrading a read lock
+            'transaction_mode': config(
+                'SQLITE_TRANSACTION_MODE', default='IMMEDIATE', cast=lambda v: v or None
+            ),
+        },
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# the cache is shared by the web workers and the qcluster through the mounted app
+# directory, so that invalidations and deduplication keys reach every process
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_LOCATION', default=BASE_DIR / 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=1000, cast=int),
+        },
+    }
+}
+# how long message statistics of the home page are cached (in seconds)
+MESSAGE_STATS_CACHE_TIMEOUT = config(
+    'MESSAGE_STATS_CACHE_TIMEOUT', default=60 * 60, cast=int
+)
+
 # Storage
 # https://docs.djangoproject.com/en/5.1/ref/settings/#storages
 
@@ -110,7 +156,7 @@ STORAGES = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': ('rest_framework.permissions.IsAuthenticated',),
     'DEFAULT_FILTER_BACKENDS': (
@@ -118,7 +164,16 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
         'rest_framework.filters.SearchFilter',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'death_notes.pagination.CustomLimitOffsetPagination',
+    'DEFAULT_PAGINATION_CLASS': 'death_notes.pagination.OptionalCursorPagination',
+    'DEFAULT_RENDERER_CLASSES': (
+        'death_notes.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'death_notes.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'PAGE_SIZE': 10,
 }
 
@@ -256,15 +311,77 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 EMAIL_TIMEOUT = 5
+# how long rendered email bodies are cached (in seconds)
+EMAIL_RENDER_CACHE_TIMEOUT = config(
+    'EMAIL_RENDER_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int
+)
 
 
 # Django Q2 Configuration
 
 Q_CLUSTER = {
     'name': 'DjangORM',
-    'workers': 1,
+    'workers': config('Q_CLUSTER_WORKERS', default=1, cast=int),
     'timeout': 60,
     'retry': 90,
     'queue_limit': 10,
     'orm': 'default',
 }
+
+
+# Delivery Configuration
+
+# number of concurrent workers sending messages in process_pending_jobs
+DELIVERY_WORKERS = config('DELIVERY_WORKERS', default=4, cast=int)
+# maximum recipients per SMTP transaction when fanning out a message
+DELIVERY_BATCH_SIZE = config('DELIVERY_BATCH_SIZE', default=50, cast=int)
+
+# how long a claimed job is leased to a worker before other workers may reclaim it
+DELIVERY_LEASE_SECONDS = config('DELIVERY_LEASE_SECONDS', default=120, cast=int)
+# maximum delivery attempts before a message is marked as failed
+DELIVERY_MAX_ATTEMPTS = config('DELIVERY_MAX_ATTEMPTS', default=5, cast=int)
+# backoff before the first retry, doubled on every further attempt up to the maximum
+DELIVERY_RETRY_BASE_SECONDS = config(
+    'DELIVERY_RETRY_BASE_SECONDS', default=60, cast=int
+)
+DELIVERY_RETRY_MAX_SECONDS = config(
+    'DELIVERY_RETRY_MAX_SECONDS', default=60 * 60 * 6, cast=int
+)
+# consecutive connection failures after which a run is stopped early
+DELIVERY_BREAKER_THRESHOLD = config('DELIVERY_BREAKER_THRESHOLD', default=3, cast=int)
+# time before jobs are delivered again after the circuit breaker opened (in seconds)
+DELIVERY_BREAKER_COOLDOWN_SECONDS = config(
+    'DELIVERY_BREAKER_COOLDOWN_SECONDS', default=300, cast=int
+)
+
+
+# Authentication Configuration
+
+# maximum number of users kept by each process to authenticate requests without a query
+AUTH_USER_CACHE_SIZE = config('AUTH_USER_CACHE_SIZE', default=1024, cast=int)
+# time after which a cached user is loaded again, even if unchanged (in seconds)
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=60, cast=int)
+
+
+# Check-in Configuration
+
+# window in which repeated check-ins only update the last checkin (in seconds)
+CHECKIN_COALESCE_SECONDS = config('CHECKIN_COALESCE_SECONDS', default=300, cast=int)
+
+
+# Test Send Configuration
+
+# window in which repeated test sends of an unchanged message are deduplicated (in seconds)
+TEST_SEND_DEDUPE_SECONDS = config('TEST_SEND_DEDUPE_SECONDS', default=60, cast=int)
+
+
+# Scheduler Configuration
+
+# file touched to wake a running scheduler when jobs are created or rescheduled
+SCHEDULER_WAKE_FILE = config('SCHEDULER_WAKE_FILE', default=BASE_DIR / 'scheduler.wake')
+# how far ahead the scheduler loads upcoming deadlines
+SCHEDULER_HORIZON_SECONDS = config('SCHEDULER_HORIZON_SECONDS', default=3600, cast=int)
+# how often the scheduler checks for wake-ups while sleeping
+SCHEDULER_POLL_SECONDS = config('SCHEDULER_POLL_SECONDS', default=1, cast=float)
+# how long the scheduler waits before retrying after a failed iteration
+SCHEDULER_BACKOFF_SECONDS = config('SCHEDULER_BACKOFF_SECONDS', default=5, cast=float)
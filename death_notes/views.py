@@ -1,5 +1,12 @@
-from django.http import JsonResponse
+from inspect import isawaitable
+
+from asgiref.sync import sync_to_async
 from django.http import HttpRequest as Request
+from django.http import JsonResponse
+from rest_framework import exceptions
+from rest_framework.request import Request as APIRequest
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
 
 def root(_: Request) -> JsonResponse:
@@ -12,3 +19,78 @@ def root(_: Request) -> JsonResponse:
         JsonResponse: Return a JSON indicating an ok status
     """
     return JsonResponse({'status': 'ok'})
+
+
+class AsyncAPIView(APIView):
+    """API view whose handlers are coroutines, served without a thread hop under ASGI.
+
+    DRF only dispatches synchronously, so this view runs the same request cycle in an
+    async dispatch. Authenticators providing an aauthenticate coroutine authenticate
+    without blocking the event loop, other authenticators run in a thread.
+    """
+
+    async def dispatch(self, request: Request, *args, **kwargs) -> Response:
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+
+            # get the appropriate handler method
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            # handlers inherited from APIView such as options are synchronous
+            if isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request: APIRequest, *args, **kwargs):
+        """Runs the checks of APIView.initial, authenticating the request asynchronously."""
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        await self.aperform_authentication(request)
+        self.check_permissions(request)
+        self.check_throttles(request)
+
+    async def aperform_authentication(self, request: APIRequest):
+        """Authenticates the request like Request.user, awaiting async authenticators.
+
+        Args:
+            request (APIRequest): The request to authenticate.
+        """
+        for authenticator in request.authenticators:
+            authenticate = getattr(authenticator, 'aauthenticate', None) or (
+                sync_to_async(authenticator.authenticate)
+            )
+            try:
+                user_auth_tuple = await authenticate(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+
+        request._not_authenticated()
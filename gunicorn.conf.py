@@ -0,0 +1,41 @@
+"""
+Gunicorn configuration for serving death_notes.asgi in production.
+
+The settings are read from the environment like the Django settings. Send SIGHUP to the
+master process to gracefully reload the workers, e.g. after a deploy.
+"""
+
+import multiprocessing
+
+# renamed as config is itself a gunicorn setting
+from decouple import config as env
+
+
+bind = env('GUNICORN_BIND', default='0.0.0.0:8000')
+
+# number of pre-forked worker processes, (2 x cores) + 1 by default. The workers only
+# share state through the database and the file-based cache, so with a per-process cache
+# backend such as LocMemCache this must be set to 1
+workers = env('GUNICORN_WORKERS', default=multiprocessing.cpu_count() * 2 + 1, cast=int)
+# the uvicorn workers run the event loop the async views are served on, the sync views run
+# in a thread. Serving death_notes.wsgi instead requires a sync class such as gthread
+worker_class = env('GUNICORN_WORKER_CLASS', default='uvicorn_worker.UvicornWorker')
+# threads per worker, only used by the gthread worker class
+threads = env('GUNICORN_THREADS', default=2, cast=int)
+
+# recycle a worker after this many requests, jittered so workers do not restart together
+max_requests = env('GUNICORN_MAX_REQUESTS', default=1000, cast=int)
+max_requests_jitter = env('GUNICORN_MAX_REQUESTS_JITTER', default=100, cast=int)
+
+# seconds to wait for the next request on a kept-alive connection
+keepalive = env('GUNICORN_KEEPALIVE', default=5, cast=int)
+# seconds before a silent worker is killed and restarted
+timeout = env('GUNICORN_TIMEOUT', default=30, cast=int)
+# seconds a worker has to finish its requests on reload or shutdown
+graceful_timeout = env('GUNICORN_GRACEFUL_TIMEOUT', default=30, cast=int)
+
+# the application is imported by each worker so a reload picks up new code
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
@@ -2,11 +2,7 @@
 
 set -e
 
-# Run migrations
-python manage.py migrate
+# Migrations and static files are handled by scripts/release.sh before the server starts
 
-# Collect static files
-python manage.py collectstatic --noinput
-
-# Start server
-python manage.py runserver 0.0.0.0:8000 --noreload
+# Start server, exec'd so that gunicorn receives the signals, e.g. SIGHUP to reload
+exec gunicorn death_notes.asgi:application --config gunicorn.conf.py
@@ -0,0 +1,9 @@
+#!/bin/bash
+
+set -e
+
+# Run migrations
+python manage.py migrate --noinput
+
+# Collect static files
+python manage.py collectstatic --noinput
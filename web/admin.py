@@ -1,6 +1,19 @@
 from django.contrib import admin
 
-from web.models import ActivityLog, Message
+from web.models import ActivityLog, Message, MessageRecipient
+
+
+class MessageRecipientInline(admin.TabularInline):
+    """Inline admin class for the MessageRecipient model."""
+
+    model = MessageRecipient
+    fields = (
+        'address',
+        'status',
+    )
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
 
 
 @admin.register(Message)
@@ -22,6 +35,7 @@ class MessageAdmin(admin.ModelAdmin):
         'status',
     )
     search_fields = ('user__email',)
+    inlines = (MessageRecipientInline,)
 
 
 @admin.register(ActivityLog)
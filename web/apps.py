@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class WebConfig(AppConfig):
@@ -7,6 +8,7 @@ class WebConfig(AppConfig):
 
     def ready(self):
         # connect signals on app initialization
-        import web.signals  # noqa: F401
+        import web.signals
 
+        post_migrate.connect(web.signals.create_message_fts_triggers, sender=self)
         return super().ready()
@@ -2,3 +2,6 @@ from web.models import Message
 
 # mapping of message types to human-readable representations
 MESSAGE_TYPE_MAPPING = {key: value.capitalize() for key, value in Message.Type.choices}
+
+# maximum number of messages written by a single bulk request
+BULK_MAX_SIZE = 100
@@ -0,0 +1,59 @@
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter
+
+from web.models import Message
+
+
+class MessageFilter(filters.FilterSet):
+    """Filters for listing messages."""
+
+    recipient = filters.CharFilter(method='filter_recipient')
+
+    class Meta:
+        model = Message
+        fields = ('type',)
+
+    def filter_recipient(self, queryset, name: str, value: str):
+        """Filters messages sent to an email address using the indexed recipients table."""
+        return queryset.filter(recipient_set__address=value.strip().lower())
+
+
+class MessageSearchFilter(SearchFilter):
+    """Search filter backed by the full-text index of messages, ranking the best matches first.
+
+    Keeps the ?search= contract of the default search filter, which is used on databases
+    without the index and for terms too short for trigram matching.
+    """
+
+    # the trigram tokenizer cannot match terms shorter than three characters
+    min_term_length = 3
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if (
+            not terms
+            or connection.vendor != 'sqlite'
+            or any(len(term) < self.min_term_length for term in terms)
+        ):
+            return super().filter_queryset(request, queryset, view)
+
+        # every term must match, quoted so that it is matched as a plain substring
+        match = ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+        return (
+            queryset.filter(
+                id__in=RawSQL(
+                    'SELECT rowid FROM web_message_fts WHERE web_message_fts MATCH %s',
+                    (match,),
+                )
+            )
+            .annotate(
+                search_rank=RawSQL(
+                    'SELECT rank FROM web_message_fts '
+                    'WHERE web_message_fts MATCH %s AND rowid = web_message.id',
+                    (match,),
+                )
+            )
+            .order_by('search_rank', *queryset.query.order_by)
+        )
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.8 on 2026-10-16 23:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_message_recipients(apps, schema_editor):
+    # backfill the recipients table from the comma-separated recipients of messages
+    Message = apps.get_model('web', 'Message')
+    MessageRecipient = apps.get_model('web', 'MessageRecipient')
+    recipients = []
+    for message_id, value in Message.objects.values_list('id', 'recipients').iterator():
+        addresses = (address.strip().lower() for address in value.split(','))
+        recipients.extend(
+            MessageRecipient(message_id=message_id, address=address)
+            for address in dict.fromkeys(address for address in addresses if address)
+        )
+    MessageRecipient.objects.bulk_create(recipients, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0006_add_status_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageRecipient',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                ('address', models.CharField(db_index=True, max_length=254)),
+                (
+                    'status',
+                    models.CharField(
+                        choices=[
+                            ('PENDING', 'Pending'),
+                            ('DELIVERED', 'Delivered'),
+                            ('FAILED', 'Failed'),
+                        ],
+                        default='PENDING',
+                        max_length=20,
+                    ),
+                ),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                (
+                    'message',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='recipient_set',
+                        to='web.message',
+                    ),
+                ),
+            ],
+            options={
+                'ordering': ('id',),
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('message', 'address'), name='unique_message_recipient'
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(
+            code=create_message_recipients, reverse_code=migrations.RunPython.noop
+        ),
+    ]
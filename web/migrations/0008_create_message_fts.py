@@ -0,0 +1,77 @@
+from django.db import migrations
+
+
+# the trigram tokenizer matches substrings like the icontains lookups it replaces, the
+# triggers keep the index in sync with every write including bulk and raw updates
+MESSAGE_FTS_TRIGGERS = {
+    'web_message_fts_insert': '''
+    CREATE TRIGGER web_message_fts_insert AFTER INSERT ON web_message BEGIN
+        INSERT INTO web_message_fts(rowid, subject, recipients)
+        VALUES (new.id, new.subject, new.recipients);
+    END
+    ''',
+    'web_message_fts_delete': '''
+    CREATE TRIGGER web_message_fts_delete AFTER DELETE ON web_message BEGIN
+        INSERT INTO web_message_fts(web_message_fts, rowid, subject, recipients)
+        VALUES ('delete', old.id, old.subject, old.recipients);
+    END
+    ''',
+    'web_message_fts_update': '''
+    CREATE TRIGGER web_message_fts_update AFTER UPDATE OF subject, recipients
+    ON web_message BEGIN
+        INSERT INTO web_message_fts(web_message_fts, rowid, subject, recipients)
+        VALUES ('delete', old.id, old.subject, old.recipients);
+        INSERT INTO web_message_fts(rowid, subject, recipients)
+        VALUES (new.id, new.subject, new.recipients);
+    END
+    ''',
+}
+
+REBUILD_MESSAGE_FTS = "INSERT INTO web_message_fts(web_message_fts) VALUES ('rebuild')"
+
+CREATE_MESSAGE_FTS = [
+    '''
+    CREATE VIRTUAL TABLE web_message_fts USING fts5(
+        subject, recipients, content='web_message', content_rowid='id', tokenize='trigram'
+    )
+    ''',
+    *MESSAGE_FTS_TRIGGERS.values(),
+    REBUILD_MESSAGE_FTS,
+]
+
+DROP_MESSAGE_FTS = [
+    'DROP TRIGGER IF EXISTS web_message_fts_insert',
+    'DROP TRIGGER IF EXISTS web_message_fts_delete',
+    'DROP TRIGGER IF EXISTS web_message_fts_update',
+    'DROP TABLE IF EXISTS web_message_fts',
+]
+
+
+def create_message_fts(apps, schema_editor):
+    # other databases fall back to the default search filter
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in CREATE_MESSAGE_FTS:
+            schema_editor.execute(sql)
+
+
+def drop_message_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_MESSAGE_FTS:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    """Creates a full-text index of message subjects and recipients on SQLite.
+
+    SQLite drops triggers when Django remakes a table, so a later migration altering the
+    message table drops them. They are recreated after every migrate by the post_migrate
+    handler web.signals.create_message_fts_triggers.
+    """
+
+    dependencies = [
+        ('web', '0007_create_messagerecipient'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_message_fts, drop_message_fts),
+    ]
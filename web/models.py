@@ -1,17 +1,43 @@
+import hashlib
+import threading
+from contextlib import contextmanager
+from smtplib import SMTPRecipientsRefused
+from typing import Iterator
+
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
+from django.core.mail.backends.smtp import EmailBackend as SMTPEmailBackend
+from django.core.mail.message import sanitize_address
 from django.db import models
 from django.template.loader import render_to_string
 from django.utils import timezone
-from django.utils.html import strip_tags
 
 from accounts.models import User
+from death_notes.models import FieldTrackingMixin
 
 
 EMAIL_TEMPLATE_NAME = 'email.html'
+EMAIL_TEXT_TEMPLATE_NAME = 'email.txt'
+# bump to invalidate cached email bodies when the templates change
+EMAIL_TEMPLATE_VERSION = 1
+EMAIL_SENDER = f'Death Notes Service <{settings.EMAIL_HOST_USER}>'
+
+
+def parse_recipients(recipients: str) -> list[str]:
+    """Parses a comma-separated list of email recipients.
+
+    Args:
+        recipients (str): Comma-separated list of email recipients.
+
+    Returns:
+        list[str]: The unique lowercased addresses in their original order.
+    """
+    addresses = (address.strip().lower() for address in recipients.split(','))
+    return list(dict.fromkeys(address for address in addresses if address))
 
 
-class Message(models.Model):
+class Message(FieldTrackingMixin, models.Model):
     """
     Represents a scheduled message that can be sent to recipients.
 
@@ -63,8 +89,20 @@ class Message(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # compared by the signal handlers on save
+    tracked_fields = ('delay', 'scheduled_at', 'recipients')
+
     def save(self, *args, **kwargs):
         """Custom save method to enforce business rules based on message type."""
+        self.validate_rules()
+        return super().save(*args, **kwargs)
+
+    def validate_rules(self):
+        """Enforces the business rules based on message type, also before bulk writes.
+
+        Raises:
+            ValueError: If the message breaks a rule of its type.
+        """
         if self.type == self.Type.FINAL_WORD:
             if not self.delay:
                 raise ValueError('Delay must be set for FINAL_WORD messages')
@@ -80,13 +118,63 @@ class Message(models.Model):
                 and self.status == self.Status.SCHEDULED
             ):
                 raise ValueError('Scheduled at cannot be in the past')
-        return super().save(*args, **kwargs)
 
-    def send(self, is_test: bool = False) -> bool:
+    @property
+    def render_cache_key(self) -> str:
+        """Cache key of the rendered email bodies, changing whenever the message is edited."""
+        # the sender details are part of the key as they are rendered in the footer
+        sender = hashlib.md5(
+            f'{self.user.first_name}|{self.user.last_name}|{self.user.email}'.encode()
+        ).hexdigest()
+        return (
+            f'message:{self.id}:render:{self.updated_at.timestamp()}'
+            f':{EMAIL_TEMPLATE_VERSION}:{sender}'
+        )
+
+    def render(self) -> tuple[str, str]:
+        """Renders the HTML and plain text email bodies of the message.
+
+        The rendered bodies are cached on first render and reused until the message is edited.
+
+        Returns:
+            tuple[str, str]: The HTML and plain text email bodies.
+        """
+        key = self.render_cache_key
+        rendered = cache.get(key)
+        if rendered is None:
+            # render the email templates with the message content
+            context = {
+                'subject': self.subject,
+                'text': self.text,
+                'type': self.type,
+                'user': self.user,
+                'base_url': settings.FRONTEND_URL,
+            }
+            rendered = (
+                render_to_string(template_name=EMAIL_TEMPLATE_NAME, context=context),
+                render_to_string(
+                    template_name=EMAIL_TEXT_TEMPLATE_NAME, context=context
+                ),
+            )
+            cache.set(key, rendered, timeout=settings.EMAIL_RENDER_CACHE_TIMEOUT)
+        return rendered
+
+    def send(
+        self,
+        is_test: bool = False,
+        connection=None,
+        commit: bool = True,
+        batch_size: int = None,
+    ) -> bool:
         """Sends the message to the recipient(s).
 
         Args:
             is_test (bool, optional): Sends the message to the user itself as a test.
+            connection (BaseEmailBackend, optional): An open email connection to reuse.
+                                                     A new connection is used if not provided.
+            commit (bool, optional): Saves the updated status to the database. Defaults to True.
+            batch_size (int, optional): Fans the message out to the recipients in batches
+                                        of this size, see fan_out. Defaults to None.
 
         Returns:
             bool: True if the message was sent successfully, otherwise False.
@@ -94,42 +182,239 @@ class Message(models.Model):
         if self.status == self.Status.DELIVERED and not is_test:
             return False
 
+        if batch_size and is_test is False:
+            return self.fan_out(batch_size, connection=connection, commit=commit)
+
         if is_test is True:
             recipients = [self.user.email]
         else:
-            recipients = [email.strip() for email in self.recipients.split(',')]
+            recipients = [recipient.address for recipient in self.recipient_set.all()]
 
-        # render the email template with the message content
-        html_message = render_to_string(
-            template_name=EMAIL_TEMPLATE_NAME,
-            context={
-                'subject': self.subject,
-                'text': self.text,
-                'type': self.type,
-                'user': self.user,
-                'base_url': settings.FRONTEND_URL,
-            },
-        )
-        plain_message = strip_tags(html_message)
+        html_message, plain_message = self.render()
 
         # send the email and update message status
         sent = send_mail(
             subject=self.subject,
             message=plain_message,
-            from_email=f'Death Notes Service <{settings.EMAIL_HOST_USER}>',
+            from_email=EMAIL_SENDER,
             recipient_list=recipients,
             html_message=html_message,
+            connection=connection,
         )
         if is_test is False:
             self.status = self.Status.DELIVERED if sent == 1 else self.Status.FAILED
-            self.save(update_fields=['status', 'updated_at'])
+            if commit:
+                self.save(update_fields=['status', 'updated_at'])
         return sent == 1
 
+    def fan_out(self, batch_size: int, connection=None, commit: bool = True) -> bool:
+        """Sends the message to its pending recipients in batches over one connection.
+
+        The email is built once and, over SMTP, its encoded bytes are reused for every batch.
+        The delivery status is recorded per recipient, so recipients that were already
+        delivered to are skipped when the message is sent again.
+
+        Args:
+            batch_size (int): The maximum number of recipients per batch.
+            connection (BaseEmailBackend, optional): An email connection to reuse.
+                                                     A new connection is used if not provided.
+            commit (bool, optional): Saves the updated statuses to the database. Defaults to True.
+
+        Returns:
+            bool: True if the message was delivered to all recipients, otherwise False.
+        """
+        recipients = [
+            recipient
+            for recipient in self.recipient_set.all()
+            if recipient.status != MessageRecipient.Status.DELIVERED
+        ]
+        connection = connection or get_connection()
+        html_message, plain_message = self.render()
+        email = EmailMultiAlternatives(
+            subject=self.subject,
+            body=plain_message,
+            from_email=EMAIL_SENDER,
+            to=[recipient.address for recipient in recipients],
+            alternatives=[(html_message, 'text/html')],
+            connection=connection,
+        )
+        is_new_connection = connection.open()
+        try:
+            if isinstance(connection, SMTPEmailBackend):
+                # encode the message once and send it to each batch of recipients
+                from_email = sanitize_address(email.from_email, email.encoding)
+                raw_message = email.message().as_bytes(linesep='\r\n')
+            for start in range(0, len(recipients), batch_size):
+                batch = recipients[start : start + batch_size]
+                addresses = [recipient.address for recipient in batch]
+                if isinstance(connection, SMTPEmailBackend):
+                    addresses = [
+                        sanitize_address(address, email.encoding)
+                        for address in addresses
+                    ]
+                    try:
+                        refused = connection.connection.sendmail(
+                            from_email, addresses, raw_message
+                        )
+                    except SMTPRecipientsRefused as error:
+                        refused = error.recipients
+                else:
+                    # other backends cannot report refused recipients
+                    email.to = addresses
+                    sent = connection.send_messages([email])
+                    refused = {} if sent == 1 else dict.fromkeys(addresses)
+                for recipient, address in zip(batch, addresses):
+                    recipient.status = (
+                        MessageRecipient.Status.FAILED
+                        if address in refused
+                        else MessageRecipient.Status.DELIVERED
+                    )
+        finally:
+            if is_new_connection:
+                connection.close()
+
+        is_sent = all(
+            recipient.status == MessageRecipient.Status.DELIVERED
+            for recipient in recipients
+        )
+        self.status = self.Status.DELIVERED if is_sent else self.Status.FAILED
+        if commit:
+            now = timezone.now()
+            for recipient in recipients:
+                recipient.updated_at = now
+            MessageRecipient.objects.bulk_update(recipients, ['status', 'updated_at'])
+            self.save(update_fields=['status', 'updated_at'])
+        return is_sent
+
+    def sync_recipients(self, created: bool = False):
+        """Writes the recipients of the message to the recipients table in bulk.
+
+        Addresses removed from the recipients are deleted and new ones are created, keeping
+        the delivery status of the unchanged ones.
+
+        Args:
+            created (bool, optional): Whether the message was just created. Defaults to False.
+        """
+        addresses = parse_recipients(self.recipients)
+        existing = set()
+        if not created:
+            self.recipient_set.exclude(address__in=addresses).delete()
+            existing = set(self.recipient_set.values_list('address', flat=True))
+        MessageRecipient.objects.bulk_create(
+            MessageRecipient(message=self, address=address)
+            for address in addresses
+            if address not in existing
+        )
+
+    @classmethod
+    def sync_recipients_in_bulk(cls, messages: list['Message'], created: bool = False):
+        """Writes the recipients of many messages to the recipients table at once.
+
+        Same as sync_recipients, with a constant number of queries for all the messages.
+
+        Args:
+            messages (list[Message]): The messages whose recipients are written.
+            created (bool, optional): Whether the messages were just created. Defaults to False.
+        """
+        addresses = {
+            message.id: parse_recipients(message.recipients) for message in messages
+        }
+        existing = set()
+        if not created:
+            stale = []
+            recipients = MessageRecipient.objects.filter(
+                message_id__in=addresses
+            ).values_list('id', 'message_id', 'address')
+            for recipient_id, message_id, address in recipients:
+                if address in addresses[message_id]:
+                    existing.add((message_id, address))
+                else:
+                    stale.append(recipient_id)
+            MessageRecipient.objects.filter(id__in=stale).delete()
+        MessageRecipient.objects.bulk_create(
+            MessageRecipient(message=message, address=address)
+            for message in messages
+            for address in addresses[message.id]
+            if (message.id, address) not in existing
+        )
+
     def __str__(self) -> str:
         """String representation of the Message object."""
         return f'Message {self.id} - {self.type} - {self.subject}'
 
 
+class MessageRecipient(models.Model):
+    """
+    Represents a single recipient of a message and its delivery status.
+
+    Attributes:
+        message (ForeignKey): The message sent to the recipient.
+        address (CharField): The lowercased email address of the recipient.
+        status (CharField): The delivery status, either PENDING, DELIVERED, or FAILED.
+        created_at (DateTimeField): The date and time when the recipient was created.
+        updated_at (DateTimeField): The date and time when the recipient was last updated.
+    """
+
+    class Status(models.TextChoices):
+        """Enumeration for recipient delivery statuses."""
+
+        PENDING = 'PENDING', 'Pending'
+        DELIVERED = 'DELIVERED', 'Delivered'
+        FAILED = 'FAILED', 'Failed'
+
+    message = models.ForeignKey(
+        Message, on_delete=models.CASCADE, related_name='recipient_set'
+    )
+    address = models.CharField(max_length=254, db_index=True)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # order recipients as they were listed
+        ordering = ('id',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['message', 'address'], name='unique_message_recipient'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """String representation of the MessageRecipient object."""
+        return f'Recipient {self.address} - {self.status}'
+
+
+class ActivityLogManager(models.Manager):
+    """Manager recording activity logs one by one, or in bulk while collecting."""
+
+    local = threading.local()
+
+    @contextmanager
+    def collect(self) -> Iterator[list['ActivityLog']]:
+        """Collects the activity logs recorded in the block and bulk creates them at its end."""
+        logs = self.local.logs = []
+        try:
+            yield logs
+        finally:
+            self.local.logs = None
+        self.bulk_create(logs)
+
+    def record(self, log: 'ActivityLog'):
+        """Saves an activity log, or adds it to the collected logs while collecting.
+
+        Args:
+            log (ActivityLog): The unsaved activity log.
+        """
+        logs = getattr(self.local, 'logs', None)
+        if logs is None:
+            log.save()
+        else:
+            logs.append(log)
+
+
 class ActivityLog(models.Model):
     """
     ActivityLog model to log user activities.
@@ -161,6 +446,8 @@ class ActivityLog(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ActivityLogManager()  # custom manager to record logs in bulk
+
     def __str__(self) -> str:
         """String representation of the ActivityLog object."""
         return f'Activity {self.id} - {self.type}'
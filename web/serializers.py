@@ -1,7 +1,118 @@
+from functools import cached_property
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.request import Request
 
 from accounts.models import User
+from web.constants import BULK_MAX_SIZE
 from web.models import ActivityLog, Message
+from web.signals import post_bulk_save
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin limiting the output to the fields selected by the request.
+
+    Reads return only the comma-separated fields of ?fields=, or all fields except those of
+    ?omit=. The id is always returned and unknown field names are ignored.
+    """
+
+    @classmethod
+    def get_sparse_fields(cls, request: Optional[Request]) -> Optional[tuple[str, ...]]:
+        """Returns the fields selected by the request.
+
+        Args:
+            request (Request, optional): The request being serialized for.
+
+        Returns:
+            tuple[str, ...]: The selected fields, None if the request selects all fields.
+        """
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None
+        fields, omit = (
+            {
+                name.strip()
+                for name in request.query_params.get(param, '').split(',')
+                if name.strip()
+            }
+            for param in ('fields', 'omit')
+        )
+        if not fields and not omit:
+            return None
+        return tuple(
+            name
+            for name in cls.Meta.fields
+            if name == 'id' or ((not fields or name in fields) and name not in omit)
+        )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        sparse_fields = self.get_sparse_fields(self.context.get('request'))
+        if sparse_fields is None:
+            return
+        for name, field in list(self.fields.items()):
+            # hidden fields are never returned and still needed for validation
+            if name not in sparse_fields and not isinstance(
+                field, serializers.HiddenField
+            ):
+                self.fields.pop(name)
+
+
+class ValuesSerializer:
+    """Read-only serializer of values() rows with the same output as a model serializer.
+
+    Rows are fetched without creating model instances. Only the fields whose representation
+    differs from the database value, such as datetimes, run their serializer field.
+    """
+
+    # fields representing a database value as the value itself
+    native_fields = (
+        serializers.BooleanField,
+        serializers.CharField,
+        serializers.ChoiceField,
+        serializers.IntegerField,
+    )
+
+    def __init__(self, serializer: serializers.Serializer):
+        self.fields = [
+            (
+                name,
+                '__'.join(field.source_attrs),
+                None if type(field) in self.native_fields else field.to_representation,
+            )
+            for name, field in serializer.fields.items()
+            if not field.write_only
+        ]
+
+    def values(self, queryset: QuerySet) -> QuerySet:
+        """Returns the rows of the queryset with the values of the serialized fields.
+
+        The ordering fields are included too, as cursor pagination reads them from the rows.
+        """
+        ordering = (
+            name.lstrip('-')
+            for name in queryset.query.order_by
+            if isinstance(name, str) and name != '?'
+        )
+        sources = (source for _, source, _ in self.fields)
+        return queryset.values(*dict.fromkeys((*sources, *ordering)))
+
+    def to_representation(self, rows: Iterable[dict]) -> list[dict]:
+        """Serializes values() rows like the model serializer serializes instances."""
+        return [
+            {
+                name: (
+                    value
+                    if (value := row[source]) is None or to_representation is None
+                    else to_representation(value)
+                )
+                for name, source, to_representation in self.fields
+            }
+            for row in rows
+        ]
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -19,13 +130,107 @@ class UserSerializer(serializers.ModelSerializer):
             'email',
         )
 
+    def update(self, instance: User, validated_data: dict) -> User:
+        """Saves only the submitted fields.
+
+        The instance is the authenticated user, which may be a cached copy older than a
+        save made by another process, e.g. a check-in. Its other fields are not written back.
+        """
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
+
+class MessageListSerializer(serializers.ListSerializer):
+    """List serializer creating and updating messages in bulk in a single transaction.
+
+    Updates identify each message by the id of its item, which must be unique. Bulk writes
+    send post_bulk_save instead of post_save, so that jobs, recipients and activity logs
+    are written in bulk.
+    """
+
+    @cached_property
+    def instance_map(self) -> dict[str, Message]:
+        """The messages being updated by their id."""
+        return {str(message.id): message for message in self.instance}
+
+    def to_internal_value(self, data):
+        # ids of the items validated so far, a message is only updated once per request
+        self.validated_ids = set()
+        return super().to_internal_value(data)
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            # validate each item against the message it updates
+            message_id = str(data.get('id') if isinstance(data, dict) else None)
+            self.child.instance = self.instance_map.get(message_id)
+            if self.child.instance is None:
+                raise serializers.ValidationError({'id': ['Message not found.']})
+            if message_id in self.validated_ids:
+                raise serializers.ValidationError({'id': ['Duplicate message.']})
+            self.validated_ids.add(message_id)
+        return super().run_child_validation(data)
 
-class MessageSerializer(serializers.ModelSerializer):
+    def validate_rules(self, messages: list[Message]):
+        """Enforces the business rules of Message.save on all the messages.
+
+        Args:
+            messages (list[Message]): The messages about to be written.
+
+        Raises:
+            ValidationError: If any of the messages breaks a rule, with the errors by item.
+        """
+        errors = []
+        for message in messages:
+            try:
+                message.validate_rules()
+                errors.append({})
+            except ValueError as error:
+                errors.append({'non_field_errors': [str(error)]})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+    def create(self, validated_data: list[dict]) -> list[Message]:
+        messages = [Message(**attrs) for attrs in validated_data]
+        self.validate_rules(messages)
+        with transaction.atomic():
+            Message.objects.bulk_create(messages)
+            post_bulk_save.send(sender=Message, instances=messages, created=True)
+        for message in messages:
+            message.snapshot()
+        return messages
+
+    def update(self, instance, validated_data: list[dict]) -> list[Message]:
+        messages, fields = [], {'updated_at'}
+        now = timezone.now()
+        for data, attrs in zip(self.initial_data, validated_data):
+            message = self.instance_map[str(data['id'])]
+            # prevent the update of type and user fields like MessageSerializer.update
+            attrs.pop('type', None)
+            attrs.pop('user', None)
+            for attr, value in attrs.items():
+                setattr(message, attr, value)
+            # bulk updates do not set auto_now fields
+            message.updated_at = now
+            fields.update(attrs)
+            messages.append(message)
+        self.validate_rules(messages)
+        with transaction.atomic():
+            Message.objects.bulk_update(messages, fields)
+            post_bulk_save.send(sender=Message, instances=messages, created=False)
+        for message in messages:
+            message.snapshot()
+        return messages
+
+
+class MessageSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # user field is hidden and set to the current user
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
     class Meta:
         model = Message
+        list_serializer_class = MessageListSerializer
         fields = (
             'id',
             'user',
@@ -53,7 +258,13 @@ class MessageSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class ActivityLogSerializer(serializers.ModelSerializer):
+class BulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=BULK_MAX_SIZE
+    )
+
+
+class ActivityLogSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = ActivityLog
         fields = (
@@ -1,21 +1,101 @@
-from django.db.models.signals import pre_save
-from django.dispatch import receiver
+from importlib import import_module
+
+from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
 
 from web.models import Message
+from web.stats import invalidate_message_stats
+
+
+# sent with the instances and created arguments after messages are bulk created or updated,
+# which does not send post_save, while their changes are still tracked
+post_bulk_save = Signal()
+
+
+@receiver(post_save, sender=Message)
+def sync_message_recipients(sender, created: bool, instance: Message, **kwargs):
+    """Signal handler to write the recipients of a Message instance when they change.
+
+    Args:
+        sender (_type_): The model class that sent the signal.
+        created (bool): A boolean indicating whether the instance was created.
+        instance (Message): The instance of Message that triggered the signal.
+    """
+    if created or instance.has_changed('recipients'):
+        instance.sync_recipients(created=created)
+
+
+@receiver(post_bulk_save, sender=Message)
+def sync_bulk_message_recipients(
+    sender, created: bool, instances: list[Message], **kwargs
+):
+    """Signal handler to write the recipients of bulk saved Message instances.
+
+    Args:
+        sender (_type_): The model class that sent the signal.
+        created (bool): A boolean indicating whether the instances were created.
+        instances (list[Message]): The bulk saved instances of Message.
+    """
+    messages = [
+        message for message in instances if created or message.has_changed('recipients')
+    ]
+    Message.sync_recipients_in_bulk(messages, created=created)
 
 
-@receiver(pre_save, sender=Message)
-def pre_save_message(sender, instance: Message, **kwargs):
-    """Signal handler to store previous values of a Message instance.
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+def invalidate_stats_on_message_change(sender, instance: Message, **kwargs):
+    """Signal handler to drop the cached statistics of a Message instance's user.
 
     Args:
         sender (_type_): The model class that sent the signal.
         instance (Message): The instance of Message that triggered the signal.
     """
-    if instance._state.adding:
-        # skip if the message is being created
+    invalidate_message_stats([instance.user_id])
+
+
+@receiver(post_bulk_save, sender=Message)
+def invalidate_stats_on_bulk_save(sender, instances: list[Message], **kwargs):
+    """Signal handler to drop the cached statistics of the users of bulk saved messages.
+
+    Args:
+        sender (_type_): The model class that sent the signal.
+        instances (list[Message]): The bulk saved instances of Message.
+    """
+    invalidate_message_stats(message.user_id for message in instances)
+
+
+def create_message_fts_triggers(sender: AppConfig, using: str, **kwargs):
+    """Post-migrate handler to recreate the triggers syncing the message full-text index.
+
+    SQLite drops the triggers when a migration remakes the message table, which would
+    leave the index out of sync with every later write. The missing triggers are recreated
+    and the index rebuilt from the table.
+
+    Args:
+        sender (AppConfig): The config of the migrated app.
+        using (str): The alias of the migrated database.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
         return
-    # cache the previous values in the instance for comparison
-    previous = Message.objects.only('delay', 'scheduled_at').get(pk=instance.pk)
-    instance.__previous_delay = previous.delay
-    instance.__previous_scheduled_at = previous.scheduled_at
+    fts = import_module('web.migrations.0008_create_message_fts')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name LIKE 'web_message_fts%'"
+        )
+        existing = {name for name, in cursor.fetchall()}
+        # the index is only created by the migration, which may not be applied
+        if 'web_message_fts' not in existing:
+            return
+        missing = [
+            sql
+            for name, sql in fts.MESSAGE_FTS_TRIGGERS.items()
+            if name not in existing
+        ]
+        for sql in missing:
+            cursor.execute(sql)
+        if missing:
+            cursor.execute(fts.REBUILD_MESSAGE_FTS)
@@ -0,0 +1,87 @@
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from web.models import Message
+
+
+def get_stats_cache_key(user_id: int) -> str:
+    """Returns the cache key of a user's message statistics."""
+    return f'message-stats:{user_id}'
+
+
+def get_stats_aggregates() -> dict:
+    """Returns the conditional counts of messages by type, in total and delivered."""
+    aggregates = {}
+    for type in Message.Type.values:
+        aggregates[f'total_{type}'] = Count('id', filter=Q(type=type))
+        aggregates[f'delivered_{type}'] = Count(
+            'id', filter=Q(type=type, status=Message.Status.DELIVERED)
+        )
+    return aggregates
+
+
+def build_message_stats(counts: dict) -> dict:
+    """Groups the aggregated counts of get_stats_aggregates by total and delivered."""
+    return {
+        'total': {type: counts[f'total_{type}'] for type in Message.Type.values},
+        'delivered': {
+            type: counts[f'delivered_{type}'] for type in Message.Type.values
+        },
+    }
+
+
+def get_message_stats(user_id: int) -> dict:
+    """Returns the counts of a user's messages by type, in total and delivered.
+
+    The counts are computed with a single conditional aggregation and cached until one of
+    the user's messages changes.
+
+    Args:
+        user_id (int): The id of the user.
+
+    Returns:
+        dict: The total and delivered counts keyed by message type.
+    """
+    key = get_stats_cache_key(user_id)
+    stats = cache.get(key)
+    if stats is not None:
+        return stats
+
+    counts = Message.objects.filter(user_id=user_id).aggregate(**get_stats_aggregates())
+    stats = build_message_stats(counts)
+    cache.set(key, stats, settings.MESSAGE_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+async def aget_message_stats(user_id: int) -> dict:
+    """Async version of get_message_stats, sharing its cache.
+
+    Args:
+        user_id (int): The id of the user.
+
+    Returns:
+        dict: The total and delivered counts keyed by message type.
+    """
+    key = get_stats_cache_key(user_id)
+    stats = await cache.aget(key)
+    if stats is not None:
+        return stats
+
+    counts = await Message.objects.filter(user_id=user_id).aaggregate(
+        **get_stats_aggregates()
+    )
+    stats = build_message_stats(counts)
+    await cache.aset(key, stats, settings.MESSAGE_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate_message_stats(user_ids: Iterable[int]):
+    """Drops the cached message statistics of the given users.
+
+    Args:
+        user_ids (Iterable[int]): The ids of the users whose messages changed.
+    """
+    cache.delete_many([get_stats_cache_key(user_id) for user_id in set(user_ids)])
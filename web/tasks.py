@@ -0,0 +1,37 @@
+from django_q.models import OrmQ
+
+from web.models import Message
+
+
+def send_test_message(message_id: int) -> bool:
+    """Sends a message as a test to its user, run on the django-q cluster.
+
+    Args:
+        message_id (int): The id of the message to send.
+
+    Returns:
+        bool: True if the message was sent successfully, otherwise False.
+    """
+    message = Message.objects.select_related('user').filter(id=message_id).first()
+    if message is None:
+        return False
+    return message.send(is_test=True)
+
+
+def is_test_message_queued(message_id: int, task_name: str) -> bool:
+    """Checks whether a test send of a message is waiting on the django-q queue.
+
+    Queued tasks only exist as signed payloads, so the queue is decoded to find the task.
+    It stays queued until the cluster saves its result.
+
+    Args:
+        message_id (int): The id of the message sent as a test.
+        task_name (str): The name the test send was queued with.
+
+    Returns:
+        bool: True if the test send is queued, otherwise False.
+    """
+    return any(
+        package.name() == task_name and list(package.args() or ())[:1] == [message_id]
+        for package in OrmQ.objects.all()
+    )
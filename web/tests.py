@@ -1,16 +1,36 @@
+import io
 import json
-from unittest.mock import patch
+import uuid
+from decimal import Decimal
+from smtplib import SMTPRecipientsRefused
+from unittest.mock import ANY, MagicMock, patch
 
 from django.contrib.auth import get_user_model
-from django.test import RequestFactory, TestCase
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.smtp import EmailBackend as SMTPEmailBackend
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.test import AsyncClient, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.timezone import now, timedelta
+from django_q.models import Task
+from django_q.tasks import async_task
 from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from web.models import ActivityLog, Message
+from death_notes.parsers import FastJSONParser
+from death_notes.renderers import FastJSONRenderer
+from web import models
+from web.models import ActivityLog, Message, MessageRecipient, parse_recipients
 from web.serializers import MessageSerializer
+from web.stats import get_message_stats
+from web.tasks import send_test_message
+from web.views import HomeAPIView
 
 
 User = get_user_model()
@@ -24,8 +44,8 @@ class SignalTests(TestCase):
         self.factory = RequestFactory()
         self.user = User.objects.create_user(email='user@test.com', password='foobar')
 
-    def test_pre_save_message(self):
-        """Test the pre_save signal for Message model."""
+    def test_message_tracks_changes(self):
+        """Test that Message tracks changes without querying the previous values."""
         # Given
         message = Message.objects.create(
             user=self.user,
@@ -35,12 +55,60 @@ class SignalTests(TestCase):
             text='Test text',
             delay=10,
         )
+        message = Message.objects.get(pk=message.pk)
         # When
         message.delay = 20
-        message.save()
         # Then
-        self.assertTrue(hasattr(message, '__previous_delay'))
-        self.assertEqual(getattr(message, '__previous_delay'), 10)
+        self.assertTrue(message.has_changed('delay'))
+        self.assertFalse(message.has_changed('recipients'))
+        self.assertEqual(message.previous('delay'), 10)
+        # When
+        with CaptureQueriesContext(connection) as queries:
+            message.save()
+        # Then
+        self.assertFalse(message.has_changed('delay'))
+        self.assertEqual(message.previous('delay'), 20)
+        self.assertFalse(
+            any(
+                query['sql'].startswith('SELECT')
+                and 'FROM "web_message"' in query['sql']
+                for query in queries.captured_queries
+            )
+        )
+
+    def test_message_fts_triggers(self):
+        """Test that the triggers syncing the full-text index are recreated after migrate."""
+        # Given
+        triggers = {
+            'web_message_fts_insert',
+            'web_message_fts_delete',
+            'web_message_fts_update',
+        }
+        query = "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+        with connection.cursor() as cursor:
+            cursor.execute(query)
+            self.assertTrue(triggers <= {name for name, in cursor.fetchall()})
+            # remaking the message table drops its triggers
+            cursor.execute('DROP TRIGGER web_message_fts_insert')
+        message = Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='user1@test.com',
+            subject='Unindexed',
+            text='Test text',
+            delay=10,
+        )
+        # When
+        emit_post_migrate_signal(verbosity=0, interactive=False, db='default')
+        # Then
+        with connection.cursor() as cursor:
+            cursor.execute(query)
+            self.assertTrue(triggers <= {name for name, in cursor.fetchall()})
+            cursor.execute(
+                'SELECT rowid FROM web_message_fts WHERE web_message_fts MATCH %s',
+                ['"unindexed"'],
+            )
+            self.assertEqual(cursor.fetchall(), [(message.id,)])
 
 
 class ModelTests(TestCase):
@@ -161,6 +229,49 @@ class ModelTests(TestCase):
                 mock_send_mail.call_args.kwargs['recipient_list'], [self.user.email]
             )
 
+    def test_send_test_message_task(self):
+        """Test the task sending a message as a test."""
+        # Given
+        message = Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='user1@test.com',
+            subject='Test Subject',
+            text='Test text',
+            delay=10,
+        )
+        # When
+        with patch('web.models.send_mail') as mock_send_mail:
+            mock_send_mail.return_value = 1
+            sent = send_test_message(message.id)
+            missing = send_test_message(message.id + 1)
+        # Then
+        self.assertTrue(sent)
+        self.assertFalse(missing)
+        self.assertEqual(
+            mock_send_mail.call_args.kwargs['recipient_list'], [self.user.email]
+        )
+
+    def test_send_message_connection(self):
+        """Test sending a message over an injected connection."""
+        # Given
+        message = Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='user1@test.com',
+            subject='Test Subject',
+            text='Test text',
+            delay=10,
+        )
+        connection = object()
+        # When
+        with patch('web.models.send_mail') as mock_send_mail:
+            mock_send_mail.return_value = 1
+            sent = message.send(connection=connection)
+            # Then
+            self.assertTrue(sent)
+            self.assertIs(mock_send_mail.call_args.kwargs['connection'], connection)
+
     def test_send_message_failed(self):
         """Test handling of message sending failure."""
         # Given
@@ -180,6 +291,185 @@ class ModelTests(TestCase):
             self.assertFalse(sent)
             self.assertEqual(message.status, Message.Status.FAILED)
 
+    def test_render_message(self):
+        """Test rendering the HTML and plain text email bodies."""
+        # Given
+        cache.clear()
+        message = Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='user1@test.com',
+            subject='Test Subject',
+            text='Fish & <chips>',
+            delay=10,
+        )
+        # When
+        html_message, plain_message = message.render()
+        # Then
+        self.assertIn('Fish &amp; &lt;chips&gt;', html_message)
+        self.assertTrue(plain_message.startswith('Fish & <chips>'))
+        self.assertIn('arranged for this message to be sent', plain_message)
+        self.assertNotIn('<p>', plain_message)
+
+    def test_render_message_cached(self):
+        """Test that rendered bodies are cached until the message is edited."""
+        # Given
+        cache.clear()
+        message = Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='user1@test.com',
+            subject='Test Subject',
+            text='Test text',
+            delay=10,
+        )
+        with patch(
+            'web.models.render_to_string', wraps=models.render_to_string
+        ) as mock_render:
+            # When
+            message.render()
+            message.render()
+            # Then
+            self.assertEqual(mock_render.call_count, 2)
+            # When
+            message.text = 'Updated text'
+            message.save()
+            _, plain_message = message.render()
+            # Then
+            self.assertEqual(mock_render.call_count, 4)
+            self.assertTrue(plain_message.startswith('Updated text'))
+
+    def test_parse_recipients(self):
+        """Test parsing comma-separated recipients into unique lowercased addresses."""
+        # When
+        addresses = parse_recipients(' User1@Test.com, user2@test.com,,user1@test.com ')
+        # Then
+        self.assertEqual(addresses, ['user1@test.com', 'user2@test.com'])
+
+    def test_sync_recipients(self):
+        """Test that recipients are written on create and update."""
+        # Given
+        message = Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='User1@test.com, user2@test.com',
+            subject='Test Subject',
+            text='Test text',
+            delay=10,
+        )
+        self.assertEqual(
+            list(message.recipient_set.values_list('address', flat=True)),
+            ['user1@test.com', 'user2@test.com'],
+        )
+        message.recipient_set.filter(address='user2@test.com').update(
+            status=MessageRecipient.Status.DELIVERED
+        )
+        # When
+        message.recipients = 'user2@test.com, user3@test.com'
+        message.save()
+        # Then
+        self.assertEqual(
+            list(message.recipient_set.values_list('address', 'status')),
+            [
+                ('user2@test.com', MessageRecipient.Status.DELIVERED),
+                ('user3@test.com', MessageRecipient.Status.PENDING),
+            ],
+        )
+
+    def test_send_message_recipients(self):
+        """Test that messages are sent to the addresses of the recipients table."""
+        # Given
+        message = Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='User1@test.com, user2@test.com',
+            subject='Test Subject',
+            text='Test text',
+            delay=10,
+        )
+        # When
+        with patch('web.models.send_mail') as mock_send_mail:
+            mock_send_mail.return_value = 1
+            message.send()
+            # Then
+            self.assertEqual(
+                mock_send_mail.call_args.kwargs['recipient_list'],
+                ['user1@test.com', 'user2@test.com'],
+            )
+
+    def test_fan_out_message(self):
+        """Test sending a message to its recipients in batches."""
+        # Given
+        message = Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='user1@test.com, user2@test.com, user3@test.com',
+            subject='Test Subject',
+            text='Test text',
+            delay=10,
+        )
+        # When
+        sent = message.send(batch_size=2)
+        # Then
+        self.assertTrue(sent)
+        self.assertEqual(
+            [email.to for email in mail.outbox],
+            [['user1@test.com', 'user2@test.com'], ['user3@test.com']],
+        )
+        message.refresh_from_db()
+        self.assertEqual(message.status, Message.Status.DELIVERED)
+        self.assertFalse(
+            message.recipient_set.exclude(
+                status=MessageRecipient.Status.DELIVERED
+            ).exists()
+        )
+
+    def test_fan_out_message_partial_failure(self):
+        """Test that only refused recipients fail and are sent to again."""
+        # Given
+        message = Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='user1@test.com, user2@test.com, user3@test.com',
+            subject='Test Subject',
+            text='Test text',
+            delay=10,
+        )
+        connection = SMTPEmailBackend()
+        connection.connection = MagicMock()
+        connection.connection.sendmail.side_effect = [
+            {'user2@test.com': (550, b'No such user')},
+            SMTPRecipientsRefused({'user3@test.com': (550, b'No such user')}),
+        ]
+        # When
+        sent = message.fan_out(batch_size=2, connection=connection)
+        # Then
+        self.assertFalse(sent)
+        self.assertEqual(message.status, Message.Status.FAILED)
+        calls = connection.connection.sendmail.call_args_list
+        self.assertEqual(calls[0].args[1], ['user1@test.com', 'user2@test.com'])
+        self.assertEqual(calls[1].args[1], ['user3@test.com'])
+        # the encoded message is reused across batches
+        self.assertIs(calls[0].args[2], calls[1].args[2])
+        self.assertEqual(
+            dict(message.recipient_set.values_list('address', 'status')),
+            {
+                'user1@test.com': MessageRecipient.Status.DELIVERED,
+                'user2@test.com': MessageRecipient.Status.FAILED,
+                'user3@test.com': MessageRecipient.Status.FAILED,
+            },
+        )
+        # When
+        connection.connection.sendmail.side_effect = None
+        connection.connection.sendmail.return_value = {}
+        sent = message.fan_out(batch_size=2, connection=connection)
+        # Then
+        self.assertTrue(sent)
+        self.assertEqual(
+            connection.connection.sendmail.call_args.args[1],
+            ['user2@test.com', 'user3@test.com'],
+        )
+
     def test_activity_log_str(self):
         """Test string representation of ActivityLog model."""
         # Given
@@ -199,6 +489,7 @@ class ViewTests(APITestCase):
         self.token = RefreshToken.for_user(self.user)
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token.access_token}')
         self.scheduled_at = now() + timedelta(days=10)
+        cache.clear()
 
     def test_unauthorized_access(self):
         """Test that unauthenticated requests are rejected."""
@@ -246,6 +537,55 @@ class ViewTests(APITestCase):
         self.assertEqual(response.json()['delivered']['FINAL_WORD'], 0)
         self.assertEqual(response.json()['delivered']['TIME_CAPSULE'], 0)
 
+    def test_home_api_view_cached(self):
+        """Test that home statistics are cached until a message changes."""
+        # Given
+        message = Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='test@test.com',
+            subject='Test Final',
+            text='Test',
+            delay=10,
+        )
+        with self.assertNumQueries(1):
+            get_message_stats(self.user.id)
+        # When
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home'))
+        # Then
+        self.assertEqual(response.json()['total']['FINAL_WORD'], 1)
+        self.assertFalse(
+            any('"web_message"' in query['sql'] for query in queries.captured_queries)
+        )
+        # When
+        message.status = Message.Status.DELIVERED
+        message.save()
+        response = self.client.get(reverse('home'))
+        # Then
+        self.assertEqual(response.json()['delivered']['FINAL_WORD'], 1)
+        # When
+        message.delete()
+        response = self.client.get(reverse('home'))
+        # Then
+        self.assertEqual(response.json()['total']['FINAL_WORD'], 0)
+
+    async def test_home_api_view_async(self):
+        """Test that HomeAPIView is served natively by an async client."""
+        # Given
+        client = AsyncClient()
+        headers = {'Authorization': f'Bearer {self.token.access_token}'}
+        # When
+        response = await client.get(reverse('home'), headers=headers)
+        options_response = await client.options(reverse('home'), headers=headers)
+        post_response = await client.post(reverse('home'), headers=headers)
+        # Then
+        self.assertTrue(HomeAPIView.view_is_async)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['total']['FINAL_WORD'], 0)
+        self.assertEqual(options_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(post_response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
     def test_checkin_api_view(self):
         """Test the check-in API endpoint."""
         # When
@@ -258,6 +598,38 @@ class ViewTests(APITestCase):
         self.assertEqual(activity_log.type, ActivityLog.Type.CHECKED_IN)
         self.assertIsNotNone(self.user.last_checkin)
 
+    def test_checkin_api_view_coalesces(self):
+        """Test that repeated check-ins within the window only update the last checkin."""
+        # Given
+        self.client.post(reverse('checkin'))
+        self.user.refresh_from_db()
+        first_checkin = self.user.last_checkin
+        # When
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('checkin'))
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertGreater(self.user.last_checkin, first_checkin)
+        self.assertEqual(
+            ActivityLog.objects.filter(type=ActivityLog.Type.CHECKED_IN).count(), 1
+        )
+        writes = [
+            query['sql']
+            for query in queries.captured_queries
+            if not query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('"last_checkin"', writes[0])
+        self.assertNotIn('"interval"', writes[0])
+        # When
+        cache.clear()  # the window has passed
+        self.client.post(reverse('checkin'))
+        # Then
+        self.assertEqual(
+            ActivityLog.objects.filter(type=ActivityLog.Type.CHECKED_IN).count(), 2
+        )
+
     def test_user_api_view_get(self):
         """Test retrieving user information via the API."""
         # When
@@ -266,6 +638,16 @@ class ViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.json()['email'], self.user.email)
 
+    def test_user_api_view_get_cached(self):
+        """Test that the authenticated user is reused without querying it again."""
+        # Given
+        self.client.get(reverse('user'))
+        # When
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('user'))
+        # Then
+        self.assertEqual(response.json()['email'], self.user.email)
+
     def test_user_api_view_patch(self):
         """Test updating user information via the API."""
         # Given
@@ -280,6 +662,23 @@ class ViewTests(APITestCase):
         self.assertEqual(self.user.first_name, 'Test')
         self.assertEqual(self.user.last_name, 'User')
 
+    def test_user_api_view_patch_cached_user(self):
+        """Test that updating a cached user only writes the submitted fields."""
+        # Given
+        self.client.get(reverse('user'))
+        last_checkin = now() + timedelta(minutes=1)
+        # a check-in saved by another process after the user was cached
+        User.objects.filter(id=self.user.id).update(last_checkin=last_checkin)
+        # When
+        response = self.client.patch(
+            reverse('user'), data={'interval': 30}, format='json'
+        )
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.interval, 30)
+        self.assertEqual(self.user.last_checkin, last_checkin)
+
     def test_message_viewset_list(self):
         """Test listing messages via the API."""
         # Given
@@ -342,8 +741,318 @@ class ViewTests(APITestCase):
         self.assertEqual(len(response.json()['results']), 1)
         self.assertEqual(response.json()['results'][0]['type'], 'FINAL_WORD')
 
+    def test_message_viewset_filter_recipient(self):
+        """Test filtering messages by recipient via the API."""
+        # Given
+        Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='first@test.com, second@test.com',
+            subject='Test Final',
+            text='Test',
+            delay=10,
+        )
+        Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='first@test.com',
+            subject='Test Other',
+            text='Test',
+            delay=10,
+        )
+        # When
+        response = self.client.get(
+            reverse('message-list') + '?recipient=Second@Test.com'
+        )
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertEqual(
+            response.json()['results'][0]['recipients'],
+            'first@test.com, second@test.com',
+        )
+
+    def test_message_viewset_search(self):
+        """Test searching messages via the full-text index, best matches first."""
+
+        # Given
+        def create_message(subject: str, recipients: str = 'test@test.com'):
+            return Message.objects.create(
+                user=self.user,
+                type=Message.Type.FINAL_WORD,
+                recipients=recipients,
+                subject=subject,
+                text='Test',
+                delay=10,
+            )
+
+        weak = create_message('A note about the birthday party and other plans')
+        strong = create_message('Party party party')
+        other = create_message('Farewell', recipients='partygoer@test.com')
+        create_message('Unrelated')
+        # When
+        response = self.client.get(reverse('message-list') + '?search=PARTY')
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [message['id'] for message in response.json()['results']]
+        self.assertEqual(set(ids), {weak.id, strong.id, other.id})
+        self.assertLess(ids.index(strong.id), ids.index(weak.id))
+        # When
+        strong.subject = 'Renamed'
+        strong.save()
+        other.delete()
+        response = self.client.get(reverse('message-list') + '?search=party birthday')
+        # Then
+        ids = [message['id'] for message in response.json()['results']]
+        self.assertEqual(ids, [weak.id])
+
+    def test_message_viewset_sparse_fieldset(self):
+        """Test listing selected message fields without loading the others."""
+        # Given
+        Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='test@test.com',
+            subject='Test Final',
+            text='Long text',
+            delay=10,
+        )
+        # When
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('message-list') + '?fields=subject,status,unknown'
+            )
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json()['results'],
+            [{'id': ANY, 'status': 'SCHEDULED', 'subject': 'Test Final'}],
+        )
+        select = next(
+            query['sql']
+            for query in queries.captured_queries
+            if query['sql'].startswith('SELECT "web_message"')
+        )
+        self.assertNotIn('"web_message"."text"', select)
+        # When
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('message-list') + '?omit=text,user')
+        # Then
+        result = response.json()['results'][0]
+        self.assertNotIn('text', result)
+        self.assertEqual(result['recipients'], 'test@test.com')
+        select = next(
+            query['sql']
+            for query in queries.captured_queries
+            if query['sql'].startswith('SELECT "web_message"')
+        )
+        self.assertNotIn('"web_message"."text"', select)
+
+    def test_activity_log_viewset_sparse_fieldset(self):
+        """Test listing selected activity log fields."""
+        # Given
+        ActivityLog.objects.create(user=self.user, type=ActivityLog.Type.CHECKED_IN)
+        # When
+        response = self.client.get(reverse('activity-list') + '?fields=type')
+        # Then
+        self.assertEqual(
+            response.json()['results'], [{'id': ANY, 'type': 'CHECKED_IN'}]
+        )
+
+    def test_message_viewset_list_output(self):
+        """Test that listing values() rows renders the same bytes as the model serializer."""
+        # Given
+        Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='test@test.com',
+            subject='Caf\u00e9 \u2028 "quoted"',
+            text='Test \U0001f600',
+            delay=10,
+        )
+        Message.objects.create(
+            user=self.user,
+            type=Message.Type.TIME_CAPSULE,
+            recipients='test@test.com',
+            subject='Test Capsule',
+            text='Test',
+            scheduled_at=self.scheduled_at,
+        )
+        messages = Message.objects.filter(user=self.user).order_by('-id')
+        expected = JSONRenderer().render(
+            {
+                'count': 2,
+                'next': None,
+                'previous': None,
+                'results': MessageSerializer(messages, many=True).data,
+            }
+        )
+        # When
+        response = self.client.get(reverse('message-list'))
+        # Then
+        self.assertEqual(response.content, expected)
+
+    def build_bulk_items(self, count: int) -> list[dict]:
+        """Builds items alternating between final words and time capsules."""
+        return [
+            (
+                {
+                    'type': 'FINAL_WORD',
+                    'recipients': f'final{i}@test.com, other@test.com',
+                    'subject': f'Final {i}',
+                    'text': 'Test',
+                    'delay': 10,
+                }
+                if i % 2
+                else {
+                    'type': 'TIME_CAPSULE',
+                    'recipients': f'capsule{i}@test.com',
+                    'subject': f'Capsule {i}',
+                    'text': 'Test',
+                    'scheduled_at': self.scheduled_at.isoformat(),
+                }
+            )
+            for i in range(count)
+        ]
+
+    def test_message_viewset_bulk_create(self):
+        """Test creating messages in bulk with a constant number of queries."""
+        # Given
+        url = reverse('message-bulk')
+        # authenticate once so that both requests are served the cached user
+        self.client.get(reverse('user'))
+        with CaptureQueriesContext(connection) as few:
+            self.client.post(url, self.build_bulk_items(2), format='json')
+        # When
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.post(url, self.build_bulk_items(6), format='json')
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.json()), 6)
+        self.assertEqual(len(many), len(few))
+        messages = Message.objects.filter(user=self.user)
+        self.assertEqual(messages.count(), 8)
+        self.assertEqual(
+            ActivityLog.objects.filter(type=ActivityLog.Type.MESSAGE_CREATED).count(), 8
+        )
+        self.assertEqual(MessageRecipient.objects.count(), 12)
+        for message in messages.select_related('job'):
+            self.assertIsNotNone(message.job.scheduled_at)
+
+    def test_message_viewset_bulk_create_rules(self):
+        """Test that bulk creation enforces the message rules and writes nothing on errors."""
+        # Given
+        items = self.build_bulk_items(2)
+        del items[1]['delay']
+        # When
+        response = self.client.post(reverse('message-bulk'), items, format='json')
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()[0], {})
+        self.assertEqual(
+            response.json()[1],
+            {'non_field_errors': ['Delay must be set for FINAL_WORD messages']},
+        )
+        self.assertFalse(Message.objects.exists())
+
+    def test_message_viewset_bulk_update(self):
+        """Test updating messages in bulk and rescheduling their jobs."""
+        # Given
+        self.client.post(
+            reverse('message-bulk'), self.build_bulk_items(2), format='json'
+        )
+        capsule, final = Message.objects.order_by('id')
+        scheduled_at = self.scheduled_at + timedelta(days=1)
+        items = [
+            {'id': capsule.id, 'subject': 'Renamed', 'scheduled_at': scheduled_at},
+            {'id': final.id, 'delay': 20, 'recipients': 'new@test.com'},
+        ]
+        # When
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(reverse('message-bulk'), items, format='json')
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # only the submitted messages are loaded
+        self.assertIn(
+            f'"web_message"."id" IN ({capsule.id}, {final.id})',
+            next(
+                query['sql']
+                for query in queries
+                if query['sql'].startswith('SELECT "web_message"."id"')
+            ),
+        )
+        capsule.refresh_from_db()
+        final.refresh_from_db()
+        self.assertEqual(capsule.subject, 'Renamed')
+        self.assertEqual(capsule.job.scheduled_at, scheduled_at)
+        self.assertEqual(final.delay, 20)
+        self.assertEqual(
+            final.job.scheduled_at, self.user.last_checkin + timedelta(days=20)
+        )
+        self.assertEqual(
+            list(final.recipient_set.values_list('address', flat=True)),
+            ['new@test.com'],
+        )
+        # When
+        other = User.objects.create_user(email='other@test.com', password='foobar')
+        other_message = Message.objects.create(
+            user=other,
+            type=Message.Type.FINAL_WORD,
+            recipients='test@test.com',
+            subject='Other',
+            text='Test',
+            delay=10,
+        )
+        response = self.client.patch(
+            reverse('message-bulk'),
+            [{'id': other_message.id, 'subject': 'Hijacked'}],
+            format='json',
+        )
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), [{'id': ['Message not found.']}])
+        # When
+        response = self.client.patch(
+            reverse('message-bulk'),
+            [
+                {'id': capsule.id, 'subject': 'First'},
+                {'id': capsule.id, 'subject': 'Second'},
+            ],
+            format='json',
+        )
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), [{}, {'id': ['Duplicate message.']}])
+        capsule.refresh_from_db()
+        self.assertEqual(capsule.subject, 'Renamed')
+
+    def test_message_viewset_bulk_delete(self):
+        """Test deleting messages in bulk with their activity logs."""
+        # Given
+        self.client.post(
+            reverse('message-bulk'), self.build_bulk_items(3), format='json'
+        )
+        self.client.post(
+            reverse('message-bulk'), self.build_bulk_items(3), format='json'
+        )
+        ids = list(Message.objects.values_list('id', flat=True))
+        # When
+        with CaptureQueriesContext(connection) as few:
+            self.client.delete(reverse('message-bulk'), {'ids': ids[:1]}, format='json')
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.delete(
+                reverse('message-bulk'), {'ids': ids[1:5]}, format='json'
+            )
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(Message.objects.count(), 1)
+        self.assertEqual(
+            ActivityLog.objects.filter(type=ActivityLog.Type.MESSAGE_DELETED).count(), 5
+        )
+
     def test_message_viewset_test_action(self):
-        """Test the 'test' action of MessageViewSet."""
+        """Test the 'test' action of MessageViewSet queues a deduplicated test send."""
         # Given
         message = Message.objects.create(
             user=self.user,
@@ -353,18 +1062,28 @@ class ViewTests(APITestCase):
             text='Test content',
             delay=10,
         )
+        url = reverse('message-detail', kwargs={'pk': message.pk}) + 'test/'
         # When
-        with patch.object(Message, 'send') as mock_send:
-            mock_send.return_value = True
-            response = self.client.get(
-                reverse('message-detail', kwargs={'pk': message.pk}) + 'test/'
-            )
-            # Then
-            self.assertEqual(response.status_code, status.HTTP_200_OK)
-            mock_send.assert_called_once_with(is_test=True)
+        with patch('web.views.async_task') as mock_async_task, patch.object(
+            Message, 'send'
+        ) as mock_send:
+            response = self.client.get(url)
+            repeated_response = self.client.get(url)
+            message.save()
+            edited_response = self.client.get(url)
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        task_id = response.json()['task_id']
+        self.assertEqual(repeated_response.json(), {'task_id': task_id})
+        self.assertNotEqual(edited_response.json()['task_id'], task_id)
+        self.assertEqual(mock_async_task.call_count, 2)
+        mock_async_task.assert_any_call(
+            send_test_message, message.id, task_name=task_id
+        )
+        mock_send.assert_not_called()
 
-    def test_message_viewset_test_action_failure(self):
-        """Test the 'test' action of MessageViewSet when sending fails."""
+    def test_message_viewset_test_status_action(self):
+        """Test the 'test' status action of MessageViewSet reports the task outcome."""
         # Given
         message = Message.objects.create(
             user=self.user,
@@ -374,15 +1093,49 @@ class ViewTests(APITestCase):
             text='Test content',
             delay=10,
         )
-        # When
-        with patch.object(Message, 'send') as mock_send:
-            mock_send.return_value = False
-            response = self.client.get(
-                reverse('message-detail', kwargs={'pk': message.pk}) + 'test/'
+        other_message = Message.objects.create(
+            user=self.user,
+            type=Message.Type.FINAL_WORD,
+            recipients='test@test.com',
+            subject='Other Message',
+            text='Test content',
+            delay=10,
+        )
+        sent_id, failed_id, queued_id, unknown_id = (uuid.uuid4().hex for _ in range(4))
+        async_task(send_test_message, message.id, task_name=queued_id)
+        for task_id, result in ((sent_id, True), (failed_id, False)):
+            Task.objects.create(
+                id=task_id,
+                name=task_id,
+                func='web.tasks.send_test_message',
+                args=(message.id,),
+                kwargs={},
+                result=result,
+                started=now(),
+                stopped=now(),
+                success=True,
             )
-            # Then
-            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-            mock_send.assert_called_once_with(is_test=True)
+
+        def get_status(message, task_id):
+            return self.client.get(
+                reverse('message-detail', kwargs={'pk': message.pk})
+                + f'test/{task_id}/'
+            )
+
+        # When
+        sent_response = get_status(message, sent_id)
+        failed_response = get_status(message, failed_id)
+        queued_response = get_status(message, queued_id)
+        unknown_response = get_status(message, unknown_id)
+        other_response = get_status(other_message, sent_id)
+        other_queued_response = get_status(other_message, queued_id)
+        # Then
+        self.assertEqual(sent_response.json(), {'task_id': sent_id, 'status': 'sent'})
+        self.assertEqual(failed_response.json()['status'], 'failed')
+        self.assertEqual(queued_response.json()['status'], 'queued')
+        self.assertEqual(unknown_response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(other_response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(other_queued_response.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_activity_log_viewset(self):
         """Test retrieving activity logs via the API."""
@@ -395,6 +1148,67 @@ class ViewTests(APITestCase):
         self.assertEqual(len(response.json()['results']), 1)
         self.assertEqual(response.json()['results'][0]['type'], 'CHECKED_IN')
 
+    def test_activity_log_viewset_cursor(self):
+        """Test paginating activity logs with cursors, newest first and without counting."""
+        # Given
+        logs = ActivityLog.objects.bulk_create(
+            ActivityLog(user=self.user, type=ActivityLog.Type.CHECKED_IN)
+            for _ in range(5)
+        )
+        ids = sorted((log.id for log in logs), reverse=True)
+        # When
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('activity-list') + '?cursor=&limit=3')
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertNotIn('count', data)
+        self.assertIsNone(data['previous'])
+        self.assertTrue(data['next'].startswith('?cursor='))
+        self.assertEqual([log['id'] for log in data['results']], ids[:3])
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries.captured_queries)
+        )
+        # When
+        response = self.client.get(reverse('activity-list') + data['next'])
+        # Then
+        data = response.json()
+        self.assertIsNone(data['next'])
+        self.assertTrue(data['previous'].startswith('?cursor='))
+        self.assertEqual([log['id'] for log in data['results']], ids[3:])
+
+
+class RendererTests(TestCase):
+    """Test the JSON renderer and parser of the API."""
+
+    def test_fast_json_renderer(self):
+        """Test that the fast renderer outputs the same bytes as the DRF renderer."""
+        # Given
+        data = {
+            'text': 'Caf\u00e9 \u2028\u2029 \U0001f600 "quoted"',
+            'timestamp': now(),
+            'decimal': Decimal('1.50'),
+            'nested': [{1: None, 'flag': True}, 2.5],
+        }
+        # Then
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4'),
+        )
+
+    def test_fast_json_parser(self):
+        """Test that the fast parser decodes JSON and rejects invalid JSON."""
+        # Given
+        content = '{"subject": "Caf\u00e9", "delay": 10}'.encode()
+        # Then
+        self.assertEqual(
+            FastJSONParser().parse(io.BytesIO(content)),
+            {'subject': 'Caf\u00e9', 'delay': 10},
+        )
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"delay": NaN}'))
+
 
 class SerializerTests(TestCase):
     """Test the serializers in the web app."""
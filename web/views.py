@@ -1,23 +1,64 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
+from django_q.tasks import async_task, fetch
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
 from rest_framework.mixins import ListModelMixin
 from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet, ModelViewSet
 
-from accounts.models import User
+from death_notes.views import AsyncAPIView
+from web.constants import BULK_MAX_SIZE
+from web.filters import MessageFilter, MessageSearchFilter
 from web.models import ActivityLog, Message
-from web.serializers import ActivityLogSerializer, MessageSerializer, UserSerializer
+from web.serializers import (
+    ActivityLogSerializer,
+    BulkDeleteSerializer,
+    MessageSerializer,
+    UserSerializer,
+    ValuesSerializer,
+)
+from web.stats import aget_message_stats
+from web.tasks import is_test_message_queued, send_test_message
+
+
+class SparseFieldsetViewMixin:
+    """View mixin loading only the model fields its serializer returns for ?fields= and ?omit=."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        sparse_fields = self.get_serializer_class().get_sparse_fields(self.request)
+        if self.action not in ('list', 'retrieve') or sparse_fields is None:
+            return queryset
+        # omitted columns such as the message text are neither fetched nor encoded
+        columns = {field.name for field in queryset.model._meta.concrete_fields}
+        return queryset.only(*(name for name in sparse_fields if name in columns))
+
+
+class ValuesListMixin:
+    """View mixin listing values() rows instead of model instances, see ValuesSerializer."""
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        serializer = ValuesSerializer(self.get_serializer())
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.to_representation(page))
+        return Response(serializer.to_representation(queryset))
 
 
-class HomeAPIView(APIView):
+class HomeAPIView(AsyncAPIView):
     """API for retrieving user statistics for the home page."""
 
-    def get(self, request: Request, *args, **kwargs) -> Response:
+    async def get(self, request: Request, *args, **kwargs) -> Response:
         """Computes user statistics and returns them.
 
         Args:
@@ -26,31 +67,21 @@ class HomeAPIView(APIView):
         Returns:
             Response: A response object with user statistics.
         """
-        queryset = Message.objects.filter(user=request.user)
         response = {
             'last_checkin': request.user.last_checkin,
-            'total': {
-                'FINAL_WORD': queryset.filter(type=Message.Type.FINAL_WORD).count(),
-                'TIME_CAPSULE': queryset.filter(type=Message.Type.TIME_CAPSULE).count(),
-            },
-            'delivered': {
-                'FINAL_WORD': queryset.filter(
-                    type=Message.Type.FINAL_WORD, status=Message.Status.DELIVERED
-                ).count(),
-                'TIME_CAPSULE': queryset.filter(
-                    type=Message.Type.TIME_CAPSULE, status=Message.Status.DELIVERED
-                ).count(),
-            },
+            **await aget_message_stats(request.user.id),
         }
         return Response(data=response, status=status.HTTP_200_OK)
 
 
-class CheckinAPIView(APIView):
+class CheckinAPIView(AsyncAPIView):
     """API for checking in to the app."""
 
-    def post(self, request: Request, *args, **kwargs) -> Response:
+    async def post(self, request: Request, *args, **kwargs) -> Response:
         """Updates the user's last checkin and creates an activity log.
 
+        Repeated check-ins within the coalescing window only update the last checkin.
+
         Args:
             request (Request): The request object.
 
@@ -58,25 +89,25 @@ class CheckinAPIView(APIView):
             Response: A response object.
         """
         request.user.last_checkin = timezone.now()
-        request.user.save()
-        ActivityLog.objects.create(
-            user=request.user,
-            type=ActivityLog.Type.CHECKED_IN,
-            description='Checked in to Death Notes',
-        )
+        await request.user.asave(update_fields=['last_checkin'])
+        # the key is only added by the first check-in of the window
+        if await cache.aadd(
+            f'checkin:{request.user.id}', True, settings.CHECKIN_COALESCE_SECONDS
+        ):
+            await ActivityLog.objects.acreate(
+                user=request.user,
+                type=ActivityLog.Type.CHECKED_IN,
+                description='Checked in to Death Notes',
+            )
         return Response(status=status.HTTP_200_OK)
 
 
-class UserAPIView(APIView):
+class UserAPIView(AsyncAPIView):
     """APIs for retrieving and updating the user."""
 
     serializer_class = UserSerializer
 
-    def get_object(self):
-        """Retrieves user object based on the request user ID."""
-        return User.objects.filter(id=self.request.user.id).first()
-
-    def get(self, request: Request, *args, **kwargs) -> Response:
+    async def get(self, request: Request, *args, **kwargs) -> Response:
         """Retrieves and returns the user.
 
         Args:
@@ -85,11 +116,12 @@ class UserAPIView(APIView):
         Returns:
             Response: A serialized user object.
         """
-        obj = self.get_object()
+        # the authenticated user is the requested user, no need to select it again
+        obj = request.user
         serializer = self.serializer_class(obj, many=False)
         return Response(data=serializer.data, status=status.HTTP_200_OK)
 
-    def patch(self, request: Request, *args, **kwargs) -> Response:
+    async def patch(self, request: Request, *args, **kwargs) -> Response:
         """Updates and returns the user.
 
         Args:
@@ -98,19 +130,23 @@ class UserAPIView(APIView):
         Returns:
             Response: A serialized user object.
         """
-        obj = self.get_object()
+        obj = request.user
         serializer = self.serializer_class(obj, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        # the serializer only sets plain fields, so they are saved with the async ORM, and
+        # only the submitted ones like UserSerializer.update
+        for attr, value in serializer.validated_data.items():
+            setattr(obj, attr, value)
+        await obj.asave(update_fields=list(serializer.validated_data))
         return Response(data=serializer.data, status=status.HTTP_200_OK)
 
 
-class MessageViewSet(ModelViewSet):
+class MessageViewSet(ValuesListMixin, SparseFieldsetViewMixin, ModelViewSet):
     """APIs for listing, retrieving, creating, updating, and deleting messages."""
 
     serializer_class = MessageSerializer
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
-    filterset_fields = ('type',)
+    filter_backends = [DjangoFilterBackend, OrderingFilter, MessageSearchFilter]
+    filterset_class = MessageFilter
     ordering = ('-id',)
     ordering_fields = (
         'delay',
@@ -130,17 +166,94 @@ class MessageViewSet(ModelViewSet):
         """Set the user for the message to prevent BOLA."""
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request: Request) -> Response:
+        """Creates many messages at once in a single transaction."""
+        serializer = self.get_serializer(
+            data=request.data, many=True, max_length=BULK_MAX_SIZE
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=self.request.user)
+        return Response(data=serializer.data, status=status.HTTP_201_CREATED)
+
+    @bulk.mapping.patch
+    def bulk_update(self, request: Request) -> Response:
+        """Updates many messages at once in a single transaction, identified by their id."""
+        # only the submitted messages are loaded to be matched with their items
+        ids = [
+            item['id']
+            for item in (request.data if isinstance(request.data, list) else [])
+            if isinstance(item, dict) and str(item.get('id')).isdigit()
+        ]
+        serializer = self.get_serializer(
+            self.get_queryset().filter(id__in=ids),
+            data=request.data,
+            many=True,
+            partial=True,
+            max_length=BULK_MAX_SIZE,
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
+
+    @bulk.mapping.delete
+    def bulk_destroy(self, request: Request) -> Response:
+        """Deletes many messages at once in a single transaction."""
+        serializer = BulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # the activity logs of the deleted jobs are created in bulk
+        with transaction.atomic(), ActivityLog.objects.collect():
+            self.get_queryset().filter(id__in=serializer.validated_data['ids']).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(detail=True, methods=['get'])
     def test(self, request: Request, pk: int = None) -> Response:
-        """Sends the message as a test to the same user."""
+        """Queues a test send of the message to the same user on the django-q cluster.
+
+        Repeated test sends of the same message version within the deduplication window
+        return the task queued by the first one instead of sending the message again.
+        """
         message = self.get_object()
-        is_sent = message.send(is_test=True)
-        if is_sent:
-            return Response(status=status.HTTP_200_OK)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        key = f'message:{message.id}:test:{message.updated_at.timestamp()}'
+        task_id = uuid.uuid4().hex
+        # the key is only added by the first test send of the window
+        if cache.add(key, task_id, settings.TEST_SEND_DEDUPE_SECONDS):
+            try:
+                async_task(send_test_message, message.id, task_name=task_id)
+            except Exception:
+                cache.delete(key)
+                raise
+        else:
+            task_id = cache.get(key, task_id)
+        return Response(data={'task_id': task_id}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'], url_path=r'test/(?P<task_id>[0-9a-f]{32})')
+    def test_status(
+        self, request: Request, pk: int = None, task_id: str = None
+    ) -> Response:
+        """Reports whether a queued test send is still queued, was sent or failed."""
+        message = self.get_object()
+        task = fetch(task_id)
+        if task is None:
+            # a task without a result is only reported as queued if it is on the queue
+            if not is_test_message_queued(message.id, task_id):
+                raise NotFound()
+            test_status = 'queued'
+        elif list(task.args)[:1] != [message.id]:
+            raise NotFound()
+        elif task.success and task.result:
+            test_status = 'sent'
+        else:
+            test_status = 'failed'
+        return Response(
+            data={'task_id': task_id, 'status': test_status},
+            status=status.HTTP_200_OK,
+        )
 
 
-class ActivityLogViewSet(GenericViewSet, ListModelMixin):
+class ActivityLogViewSet(
+    ValuesListMixin, SparseFieldsetViewMixin, GenericViewSet, ListModelMixin
+):
     """API for listing activity logs."""
 
     serializer_class = ActivityLogSerializer